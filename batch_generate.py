@@ -0,0 +1,115 @@
+import argparse
+import csv
+import os
+import time
+from functools import partial
+from post_generator import create_post
+from preprocess import ordered_map
+from post_io import iter_jsonl, write_jsonl_record, recover_jsonl
+from metrics import REGISTRY
+
+# Accepted column names for each generate_post argument
+FIELD_ALIASES = {
+    "post_length": ("length", "post_length"),
+    "language": ("language",),
+    "topic": ("topic",),
+    "profession": ("profession",),
+    "post_reason": ("purpose", "post_reason"),
+    "custom_keywords": ("keywords", "custom_keywords"),
+}
+
+
+def iter_jobs(jobs_file_path):
+    """Yields (job_id, row) pairs from a CSV or JSONL job file; rows without an 'id' use their position."""
+
+    if jobs_file_path.endswith(".csv"):
+        with open(jobs_file_path, encoding="utf-8", newline="") as file:
+            rows = csv.DictReader(file)
+            for index, row in enumerate(rows):
+                yield str(row.get("id") or index), row
+    else:
+        for index, row in enumerate(iter_jsonl(jobs_file_path)):
+            yield str(row.get("id", index)), row
+
+
+def job_arguments(row):
+    """Maps a job row onto create_post keyword arguments."""
+
+    arguments = {}
+    for field, aliases in FIELD_ALIASES.items():
+        value = next((row[alias] for alias in aliases if row.get(alias) not in (None, "")), "")
+        arguments[field] = value
+    arguments["post_length"] = arguments["post_length"] or "Medium"
+    arguments["language"] = arguments["language"] or "English"
+    return arguments
+
+
+def completed_job_ids(output_file_path):
+    """Returns the ids already generated successfully in a previous (possibly interrupted) run."""
+
+    recover_jsonl(output_file_path)  # Drop a half-written last line
+    if not os.path.exists(output_file_path):
+        return set()
+    return {record["id"] for record in iter_jsonl(output_file_path) if record.get("status") == "ok"}
+
+
+def run_job(job, fresh=False):
+    """Generates one post and returns its result record (never raises)."""
+
+    job_id, row = job
+    started = time.perf_counter()
+    record = {"id": job_id, "status": "error", "input": row}
+    try:
+        record["post"] = create_post(**job_arguments(row), fresh=fresh)
+        record["status"] = "ok"
+    except Exception as e:
+        record["error"] = str(e)
+    record["elapsed"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+def run_batch(jobs_file_path, output_file_path, max_workers=4, fresh=False):
+    """
+    Generates a post for every job row and appends one JSONL result per row to the output file.
+
+    Rows run concurrently under the shared LLM rate limiter. Rows that already have an
+    "ok" result in the output file are skipped, so an interrupted or partly failed job can
+    simply be run again. Returns a {"ok": n, "error": n, "skipped": n} summary.
+    """
+
+    if not os.path.exists(jobs_file_path):
+        raise FileNotFoundError(f"File not found: {jobs_file_path}")
+
+    done = completed_job_ids(output_file_path)
+    summary = {"ok": 0, "error": 0, "skipped": 0}
+
+    def pending_jobs():
+        for job in iter_jobs(jobs_file_path):
+            if job[0] in done:
+                summary["skipped"] += 1
+            else:
+                yield job
+
+    with open(output_file_path, mode="a", encoding="utf-8") as outfile:
+        for record in ordered_map(partial(run_job, fresh=fresh), pending_jobs(), max_workers):
+            write_jsonl_record(outfile, record)
+            summary[record["status"]] += 1
+            if record["status"] == "error":
+                print(f"⚠️ Job {record['id']} failed: {record['error']}")
+
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate LinkedIn posts in bulk from a CSV or JSONL job file.")
+    parser.add_argument("jobs", help="Job file with length, language, topic, profession, purpose and keywords columns")
+    parser.add_argument("--output", default="data/generated_posts.jsonl", help="JSONL file receiving one result per job")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent generations (still bounded by the rate limiter)")
+    parser.add_argument("--fresh", action="store_true", help="Bypass the generation cache")
+    parser.add_argument("--metrics", default=None, help="Write timing/token metrics here (.prom for Prometheus text, else JSON)")
+    args = parser.parse_args()
+
+    summary = run_batch(args.jobs, args.output, max_workers=args.workers, fresh=args.fresh)
+    print(f"Done: {summary['ok']} generated, {summary['error']} failed, {summary['skipped']} already done")
+    if args.metrics:
+        REGISTRY.write(args.metrics)
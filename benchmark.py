@@ -0,0 +1,239 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from llm_backends import StubChatModel
+from llm_helper import set_llm
+from metrics import REGISTRY
+from rate_limiter import set_default_limiter
+
+# Metrics where a larger value is better; every other metric is a duration (smaller is better)
+HIGHER_IS_BETTER = {"posts_per_sec", "mb_per_sec", "queries_per_sec"}
+
+
+def synthetic_raw_posts(size, source="data/raw.json"):
+    """Scales the bundled raw corpus up to `size` posts, making every copy's text unique."""
+
+    with open(source, encoding="utf-8") as f:
+        base = json.load(f)
+    return [
+        {**base[i % len(base)], "text": f"{base[i % len(base)]['text']}\n#{i}"}
+        for i in range(size)
+    ]
+
+
+def synthetic_processed_posts(size, source="data/processed_posts.json"):
+    """Scales the bundled processed corpus up to `size` posts."""
+
+    with open(source, encoding="utf-8") as f:
+        base = json.load(f)
+    return [
+        {**base[i % len(base)], "text": f"{base[i % len(base)]['text']}\n#{i}", "engagement": i % 1000}
+        for i in range(size)
+    ]
+
+
+def percentiles(samples):
+    """Returns p50/p90/p99/mean of a list of durations in seconds."""
+
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return {"p50": pick(0.50), "p90": pick(0.90), "p99": pick(0.99), "mean": statistics.fmean(ordered)}
+
+
+def bench_process_posts(sizes, workdir, workers, batch_tokens):
+    import preprocess
+
+    results = []
+    for size in sizes:
+        raw_path = os.path.join(workdir, f"raw_{size}.json")
+        with open(raw_path, "w", encoding="utf-8") as f:
+            json.dump(synthetic_raw_posts(size), f)
+
+        started = time.perf_counter()
+        preprocess.process_posts(raw_path, os.path.join(workdir, f"processed_{size}.json"),
+                                 max_workers=workers, batch_token_budget=batch_tokens)
+        elapsed = time.perf_counter() - started
+        results.append({
+            "name": "process_posts",
+            "params": {"size": size, "workers": workers, "batch_tokens": batch_tokens},
+            "metrics": {"seconds": elapsed, "posts_per_sec": size / elapsed},
+        })
+    return results
+
+
+def bench_few_shot(sizes, workdir, queries=2000):
+    from few_shot import FewShotPosts
+    from post_io import iter_posts
+    from post_store import write_columnar
+    from vector_index import VectorIndex, vector_index_path
+
+    # Warm-up so the first size does not pay for importing pandas
+    warmup = os.path.join(workdir, "fewshot_warmup.json")
+    with open(warmup, "w", encoding="utf-8") as f:
+        json.dump(synthetic_processed_posts(10), f)
+    FewShotPosts(warmup)
+
+    results = []
+    for size in sizes:
+        path = os.path.join(workdir, f"fewshot_{size}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(synthetic_processed_posts(size), f)
+        # As preprocessing leaves it, so loading times exclude building the index
+        VectorIndex.build(iter_posts(path)).save(vector_index_path(path))
+
+        started = time.perf_counter()
+        fs = FewShotPosts(path)
+        load_seconds = time.perf_counter() - started
+
+        columnar_path = os.path.join(workdir, f"fewshot_{size}.apcol")
+        write_columnar(iter_posts(path), columnar_path)
+        started = time.perf_counter()
+        FewShotPosts(columnar_path)
+        columnar_load_seconds = time.perf_counter() - started
+
+        tags = sorted(fs.get_tags())
+        lookups = [(length, language, tags[i % len(tags)])
+                   for i, (length, language) in enumerate([("Short", "English"), ("Medium", "English"),
+                                                           ("Long", "English"), ("Medium", "Tanglish")] * (queries // 4))]
+        latencies = []
+        for lookup in lookups:
+            started = time.perf_counter()
+            fs.get_filtered_posts(*lookup)
+            latencies.append(time.perf_counter() - started)
+
+        results.append({
+            "name": "few_shot",
+            "params": {"size": size},
+            "metrics": {"load_seconds": load_seconds, "columnar_load_seconds": columnar_load_seconds, **{f"query_{k}": v for k, v in percentiles(latencies).items()},
+                        "queries_per_sec": len(latencies) / sum(latencies)},
+        })
+    return results
+
+
+def bench_tanglish(megabytes):
+    from tanglish import TanglishCorrector
+
+    corrector = TanglishCorrector.from_file()
+    phrases = list(corrector.corrections)
+    filler = "naan indha week romba busy ah irundhen but learning continue pannitu iruken. "
+    unit = " ".join(f"{filler}{phrase}" for phrase in phrases)
+    text = unit * max(1, int(megabytes * 1_000_000 / len(unit)))
+
+    started = time.perf_counter()
+    corrector.correct(text)
+    elapsed = time.perf_counter() - started
+    return [{
+        "name": "correct_tanglish_spelling",
+        "params": {"megabytes": round(len(text) / 1_000_000, 2)},
+        "metrics": {"seconds": elapsed, "mb_per_sec": len(text) / 1_000_000 / elapsed},
+    }]
+
+
+def bench_generate_post(requests):
+    from post_generator import generate_post, set_generation_cache
+
+    set_generation_cache(None)  # Measure the full path, not cache hits
+    inputs = [("Short", "English", "Job Search"), ("Medium", "Tanglish", "Motivation"), ("Long", "English", "AI")]
+    latencies = []
+    for i in range(requests):
+        length, language, topic = inputs[i % len(inputs)]
+        started = time.perf_counter()
+        generate_post(length, language, topic, "Data Scientist", "Sharing Industry Insights", f"keyword{i}")
+        latencies.append(time.perf_counter() - started)
+    return [{
+        "name": "generate_post",
+        "params": {"requests": requests},
+        "metrics": {f"latency_{k}": v for k, v in percentiles(latencies).items()},
+    }]
+
+
+def compare(results, baseline, tolerance):
+    """Returns a list of human-readable regressions of `results` against a baseline report."""
+
+    previous = {(r["name"], json.dumps(r["params"], sort_keys=True)): r["metrics"] for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = previous.get((result["name"], json.dumps(result["params"], sort_keys=True)))
+        if not old:
+            continue
+        for metric, value in result["metrics"].items():
+            if metric not in old or not old[metric]:
+                continue
+            change = value / old[metric] - 1
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            if worse > tolerance:
+                regressions.append(f"{result['name']} {result['params']} {metric}: {old[metric]:.6g} -> {value:.6g} ({worse:+.0%} worse)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the AutoPost-AI pipeline against the local stub LLM.")
+    parser.add_argument("--sizes", default="100,1000,10000", help="Comma-separated corpus sizes (up to 100000)")
+    parser.add_argument("--only", default="process_posts,few_shot,tanglish,generate_post", help="Benchmarks to run")
+    parser.add_argument("--workers", type=int, default=8, help="max_workers for process_posts")
+    parser.add_argument("--batch-tokens", type=int, default=None, help="batch_token_budget for process_posts")
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="Stub seconds before the first token")
+    parser.add_argument("--stub-tokens-per-second", type=float, default=0.0, help="Stub output pacing (0 = instant)")
+    parser.add_argument("--tanglish-mb", type=float, default=10.0, help="Text size for the Tanglish benchmark")
+    parser.add_argument("--requests", type=int, default=200, help="generate_post calls to time")
+    parser.add_argument("--output", default=None, help="Write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", default=None, help="Previous JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression vs the baseline")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    selected = set(args.only.split(","))
+
+    # Offline and unthrottled: we measure our own overhead, not the provider's
+    set_llm(StubChatModel(latency=args.stub_latency, tokens_per_second=args.stub_tokens_per_second))
+    set_default_limiter(None)
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        if "process_posts" in selected:
+            results += bench_process_posts(sizes, workdir, args.workers, args.batch_tokens)
+        if "few_shot" in selected:
+            results += bench_few_shot(sizes, workdir)
+    if "tanglish" in selected:
+        results += bench_tanglish(args.tanglish_mb)
+    if "generate_post" in selected:
+        results += bench_generate_post(args.requests)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "stub_latency": args.stub_latency,
+            "stub_tokens_per_second": args.stub_tokens_per_second,
+        },
+        "results": results,
+        "metrics": REGISTRY.snapshot(),  # Per-stage spans and per-operation LLM call stats
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"⚠️ Regression: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
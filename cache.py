@@ -0,0 +1,197 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_key(*parts):
+    """Builds a content-addressed cache key from the given string parts."""
+
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x00")  # Separator so ("ab", "c") and ("a", "bc") differ
+    return digest.hexdigest()
+
+
+class CacheStatsMixin:
+    """Hit/miss counters shared by the cache backends."""
+
+    hits = 0
+    misses = 0
+
+    def stats(self):
+        """Returns hit/miss counters for this cache instance."""
+
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class MemoryCache(CacheStatsMixin):
+    """In-process LRU cache with an optional time-to-live, for a single worker."""
+
+    def __init__(self, max_entries=1024, ttl=None, clock=time.time):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the cached value for `key`, or None on a miss or an expired entry."""
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and self.clock() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, version=""):
+        """Stores a value, evicting the least recently used entries beyond max_entries."""
+
+        with self._lock:
+            self._entries[key] = (self.clock(), value)
+            self._entries.move_to_end(key)
+            while self.max_entries and len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, current_version=None):
+        """Drops every entry (versions are not tracked in memory)."""
+
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            return count
+
+    def close(self):
+        pass
+
+
+class SQLiteCache(CacheStatsMixin):
+    """Persistent JSON value cache stored in a SQLite file, shareable across worker processes.
+
+    Every entry records a `version` (e.g. a hash of the prompt template) so stale
+    entries can be dropped with `invalidate()` once the template changes. Optional
+    `max_entries` (least recently used first) and `ttl` (seconds) bound the cache.
+    """
+
+    def __init__(self, path, namespace="default", max_entries=None, ttl=None, clock=time.time):
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                version TEXT NOT NULL DEFAULT '',
+                value TEXT NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )"""
+        )
+        # Caches created before LRU/TTL support lack the timestamp columns
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(cache)")}
+        for column in ("created_at", "accessed_at"):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE cache ADD COLUMN {column} REAL NOT NULL DEFAULT 0")
+        self._conn.commit()
+
+    def get(self, key):
+        """Returns the cached value for `key`, or None on a miss."""
+
+        return self.get_first([key])
+
+    def get_first(self, keys):
+        """Returns the value of the first key present in the cache, counting a single hit or miss."""
+
+        with self._lock:
+            now = self.clock()
+            for key in keys:
+                row = self._conn.execute(
+                    "SELECT value, created_at FROM cache WHERE namespace = ? AND key = ?",
+                    (self.namespace, key),
+                ).fetchone()
+                if row is None:
+                    continue
+                if self.ttl is not None and now - row[1] > self.ttl:
+                    self._conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+                    self._conn.commit()
+                    continue
+                if self.max_entries:
+                    self._conn.execute(
+                        "UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                        (now, self.namespace, key),
+                    )
+                    self._conn.commit()
+                self.hits += 1
+                return json.loads(row[0])
+            self.misses += 1
+            return None
+
+    def set(self, key, value, version=""):
+        """Stores a JSON-serialisable value under `key`."""
+
+        with self._lock:
+            now = self.clock()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, version, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self.namespace, key, version, json.dumps(value), now, now),
+            )
+            if self.max_entries:
+                self._conn.execute(
+                    """DELETE FROM cache WHERE namespace = ? AND key IN (
+                        SELECT key FROM cache WHERE namespace = ?
+                        ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                    )""",
+                    (self.namespace, self.namespace, self.max_entries),
+                )
+            self._conn.commit()
+
+    def invalidate(self, current_version=None):
+        """Deletes entries whose version differs from `current_version`, or every entry if None.
+
+        Returns the number of deleted entries.
+        """
+
+        with self._lock:
+            if current_version is None:
+                cursor = self._conn.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+            else:
+                cursor = self._conn.execute(
+                    "DELETE FROM cache WHERE namespace = ? AND version != ?",
+                    (self.namespace, current_version),
+                )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_cache(spec, namespace="default", max_entries=None, ttl=None):
+    """Builds a cache from a spec string: '' or None (disabled), 'memory', or a SQLite file path."""
+
+    if not spec:
+        return None
+    if spec == "memory":
+        return MemoryCache(max_entries=max_entries or 1024, ttl=ttl)
+    return SQLiteCache(spec, namespace=namespace, max_entries=max_entries, ttl=ttl)
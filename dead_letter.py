@@ -0,0 +1,45 @@
+import os
+import time
+from post_io import iter_jsonl, write_jsonl_record
+
+# Posts whose enrichment failed, kept for `preprocess.py --replay-dead-letters`
+DEAD_LETTER_FILE = "data/dead_letters.jsonl"
+
+
+class DeadLetterFile:
+    """JSONL file of posts that failed enrichment, one record per post with its error and attempt count.
+
+    The file is only created once a post fails. Unless `resume` is set, a file left by an
+    earlier run is removed, so the file always describes the latest run.
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.count = 0
+        self._file = None
+        if not resume and os.path.exists(path):
+            os.remove(path)
+
+    def add(self, post, error):
+        """Records a raw post together with the exception that made it fail."""
+
+        if self._file is None:
+            self._file = open(self.path, mode="a", encoding="utf-8")
+        write_jsonl_record(self._file, {
+            "post": post,
+            "error": f"{type(error).__name__}: {error}",
+            "attempts": getattr(error, "attempts", 1),  # MaxRetriesError knows how often the call was tried
+            "failed_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        })
+        self.count += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def read_dead_letters(path):
+    """Returns the records of a dead-letter file (an empty list if there is none)."""
+
+    return list(iter_jsonl(path)) if os.path.exists(path) else []
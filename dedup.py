@@ -0,0 +1,92 @@
+import re
+import zlib
+import numpy as np
+from tag_unifier import similarity
+
+# Estimated Jaccard similarity of word shingles above which two posts count as near-duplicates
+DEDUP_THRESHOLD = 0.8
+
+_WORD = re.compile(r"\w+")
+
+
+def shingles(text, k=3):
+    """Returns the hashed k-word shingles of a post, ignoring case, punctuation and spacing."""
+
+    words = _WORD.findall(text.lower())
+    if len(words) < k:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))}
+    return {zlib.crc32(" ".join(words[i:i + k]).encode("utf-8")) for i in range(len(words) - k + 1)}
+
+
+def lsh_parameters(threshold, num_perm):
+    """Picks (bands, rows) so that pairs at `threshold` similarity are about as likely to collide as not.
+
+    A pair with Jaccard similarity s shares a band with probability 1 - (1 - s^rows)^bands,
+    whose steep part sits near (1 / bands)^(1 / rows).
+    """
+
+    return min(
+        ((num_perm // rows, rows) for rows in range(1, num_perm + 1)),
+        key=lambda option: abs((1 / option[0]) ** (1 / option[1]) - threshold),
+    )
+
+
+class MinHasher:
+    """Computes MinHash signatures with `num_perm` independent 64-bit hash functions (NumPy, vectorised per post).
+
+    Each hash function is the splitmix64 finalizer applied to the shingle hash XORed with its
+    own random 64-bit seed, so the functions behave as independent random permutations.
+    """
+
+    def __init__(self, num_perm=128, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.seeds = rng.integers(0, np.iinfo(np.uint64).max, num_perm, dtype=np.uint64, endpoint=True)
+
+    def signature(self, shingle_hashes):
+        hashes = np.fromiter(shingle_hashes, dtype=np.uint64)
+        mixed = hashes[:, None] ^ self.seeds[None, :]
+        # splitmix64 finalizer; uint64 array arithmetic wraps modulo 2^64 as intended
+        mixed ^= mixed >> np.uint64(30)
+        mixed *= np.uint64(0xBF58476D1CE4E5B9)
+        mixed ^= mixed >> np.uint64(27)
+        mixed *= np.uint64(0x94D049BB133111EB)
+        mixed ^= mixed >> np.uint64(31)
+        return mixed.min(axis=0)
+
+
+def find_near_duplicates(texts, threshold=DEDUP_THRESHOLD, num_perm=128):
+    """Groups near-duplicate texts and returns each text's representative index (itself if unique).
+
+    Texts are visited in order; each one is compared only with the representatives that
+    share an LSH band with it, and joins the most similar one whose exact shingle Jaccard
+    similarity reaches `threshold` (MinHash only proposes candidates), otherwise it becomes a
+    representative. Every duplicate is therefore close to its representative, and the work
+    grows linearly with the corpus.
+    """
+
+    hasher = MinHasher(num_perm)
+    bands, rows = lsh_parameters(threshold, num_perm)
+    buckets = [{} for _ in range(bands)]
+    representative_shingles = {}
+    representatives = []
+
+    for i, text in enumerate(texts):
+        text_shingles = shingles(text)
+        signature = hasher.signature(text_shingles)
+        keys = [signature[band * rows:(band + 1) * rows].tobytes() for band in range(bands)]
+
+        candidates = {rep for bucket, key in zip(buckets, keys) for rep in bucket.get(key, ())}
+        best, best_similarity = i, 0.0
+        for candidate in sorted(candidates):
+            score = similarity(text_shingles, representative_shingles[candidate])
+            if score >= threshold and score > best_similarity:
+                best, best_similarity = candidate, score
+
+        representatives.append(best)
+        if best == i:
+            representative_shingles[i] = text_shingles
+            for bucket, key in zip(buckets, keys):
+                bucket.setdefault(key, []).append(i)
+
+    return representatives
@@ -0,0 +1,88 @@
+import os
+import re
+import threading
+import zlib
+import numpy as np
+
+# Embedder used when building vector indexes: "hashing" (default, no extra dependency) or
+# "sentence-transformers[:model name]" (requires the optional sentence-transformers package)
+DEFAULT_EMBEDDER = "hashing"
+
+
+class HashingEmbedder:
+    """CPU-only text embedder: word, word-bigram and character trigram features hashed into `dim` buckets.
+
+    Deterministic and dependency-free (NumPy only), so indexes built during preprocessing
+    match the queries made by the app. Captures lexical and sub-word overlap
+    ("Kubernetes" ~ "k8s cluster" will not match, "Kubernetes" ~ "Kubernetes operators" will).
+    """
+
+    def __init__(self, dim=256):
+        self.dim = dim
+        self.name = f"hashing:{dim}"
+
+    def features(self, text):
+        words = [word for word in re.findall(r"\w+", text.lower()) if len(word) > 2]
+        for word in words:
+            yield word
+            padded = f"<{word}>"
+            for i in range(len(padded) - 2):
+                yield padded[i:i + 3]
+        for first, second in zip(words, words[1:]):
+            yield f"{first} {second}"
+
+    def embed(self, texts):
+        """Returns an (n, dim) float32 array of L2-normalised vectors."""
+
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.fromiter((zlib.crc32(feature.encode("utf-8")) for feature in self.features(text)), dtype=np.uint32)
+            if not len(hashes):
+                continue
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0)  # Signed hashing keeps collisions unbiased
+            counts = np.bincount(hashes % self.dim, weights=signs, minlength=self.dim)
+            vectors[row] = np.sign(counts) * np.log1p(np.abs(counts))  # Damp repeated words
+        return normalize(vectors)
+
+
+class SentenceTransformerEmbedder:
+    """Embeds with a local sentence-transformers model (optional dependency, CPU by default)."""
+
+    def __init__(self, model_name="all-MiniLM-L6-v2"):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise ImportError("The sentence-transformers embedder needs `pip install sentence-transformers`.")
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.name = f"sentence-transformers:{model_name}"
+
+    def embed(self, texts):
+        return normalize(np.asarray(self.model.encode(list(texts), batch_size=64), dtype=np.float32))
+
+
+def normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+_embedders = {}
+_embedders_lock = threading.Lock()
+
+
+def get_embedder(name=None):
+    """Returns a shared embedder by name (default: AUTOPOST_EMBEDDER, else "hashing")."""
+
+    name = name or os.getenv("AUTOPOST_EMBEDDER", DEFAULT_EMBEDDER)
+    with _embedders_lock:
+        embedder = _embedders.get(name)
+        if embedder is None:
+            kind, _, option = name.partition(":")
+            if kind == "hashing":
+                embedder = HashingEmbedder(int(option or 256))
+            elif kind == "sentence-transformers":
+                embedder = SentenceTransformerEmbedder(option or "all-MiniLM-L6-v2")
+            else:
+                raise ValueError(f"Unknown embedder: {name!r}")
+            _embedders[name] = embedder
+        return embedder
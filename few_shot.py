@@ -1,42 +1,174 @@
-import pandas as pd
 import json
+import os
+import re
+import threading
+from post_store import ColumnarPosts, categorize_length, posts_fingerprint
+from vector_index import VectorIndex, vector_index_path
 
 
 class FewShotPosts:
-    def __init__(self, file_path="data/processed_posts.json"):
-        self.df = None
+    def __init__(self, file_path="data/processed_posts.json", index_path=None):
+        self._df = None
+        self.store = None
+        self.records = []
         self.unique_tags = None
+        self.index = {}
+        self.style_index = {}
+        self.vector_index = None
+        self.fingerprint = None
         self.load_posts(file_path)
+        self.build_tag_matcher()
+        self.load_vector_index(index_path or vector_index_path(file_path))
+
+    @property
+    def df(self):
+        # Columnar files only build the DataFrame if something asks for it
+        if self._df is None and self.store is not None:
+            import pandas as pd
+            self._df = pd.DataFrame([self.store.record(row) for row in range(len(self.store))])
+        return self._df
 
     def load_posts(self, file_path):
+        if file_path.endswith(".apcol"):
+            # Memory-mapped (see post_store): startup reads the header and the stored indexes only
+            self.store = ColumnarPosts(file_path)
+            self.index = self.store.index("group")
+            self.style_index = self.store.index("style")
+            self.unique_tags = list(self.store.tags)
+            self.fingerprint = self.store.fingerprint  # Recorded by write_columnar, so no record is read here
+            return
+
+        import pandas as pd  # Deferred so importing this module (e.g. via post_generator) stays cheap
         with open(file_path, encoding="utf-8") as f:
-            posts = json.load(f)
-            self.df = pd.json_normalize(posts)
-            self.df['length'] = self.df['line_count'].apply(self.categorize_length)
-            # collect unique tags
-            all_tags = self.df['tags'].apply(lambda x: x).sum()
-            self.unique_tags = list(set(all_tags))
-
-    def get_filtered_posts(self, length, language, tag):
-        df_filtered = self.df[
-            (self.df['tags'].apply(lambda tags: tag in tags)) &  # Tags contain 'Influencer'
-            (self.df['language'] == language) &  # Language is 'English'
-            (self.df['length'] == length)  # Line count is less than 5
-        ]
-        return df_filtered.to_dict(orient='records')
+            if file_path.endswith(".jsonl"):
+                posts = [json.loads(line) for line in f if line.strip()]
+            else:
+                posts = json.load(f)
+            self.fingerprint = posts_fingerprint(posts)
+            self._df = pd.json_normalize(posts)
+            self._df['length'] = self._df['line_count'].apply(self.categorize_length)
+            self.records = self._df.to_dict(orient='records')
+            self.build_index(self.records)
+
+    def load_vector_index(self, index_path):
+        """Loads the semantic index of these posts, building and saving it first if it is missing or stale.
+
+        The index is matched to the posts by fingerprint (see post_store.posts_fingerprint), so an
+        edited or reordered posts file never maps hits to the wrong posts.
+        """
+        if self.fingerprint is None:
+            print("⚠️ Warning: the columnar posts file has no fingerprint. Rewrite it with post_store.py "
+                  "to enable semantic search.")
+            return
+        if VectorIndex.exists(index_path):
+            try:
+                vector_index = VectorIndex.load(index_path)
+                if vector_index.fingerprint == self.fingerprint and len(vector_index) == self.count():
+                    self.vector_index = vector_index
+                    return
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Warning: could not load vector index {index_path}: {e}")
+        # Missing (e.g. a fresh checkout) or built from other posts: embedding needs no LLM calls
+        self.vector_index = VectorIndex.build(self.get_post(row) for row in range(self.count()))
+        try:
+            self.vector_index.save(index_path)
+        except OSError as e:
+            print(f"⚠️ Warning: could not save vector index {index_path}: {e}")
+
+    def count(self):
+        return len(self.store) if self.store is not None else len(self.records)
+
+    def get_post(self, row):
+        """Returns the post at a row of the processed posts file."""
+        return self.store.record(row) if self.store is not None else self.records[row]
+
+    def build_index(self, records):
+        """Builds the (tag, language, length) and (language, length) -> records indexes and the unique tag list."""
+        self.index = {}
+        self.style_index = {}
+        unique_tags = set()
+        # Best engagement first, like the columnar indexes (stable, so ties keep file order)
+        for record in sorted(records, key=lambda record: -record.get('engagement', 0)):
+            self.style_index.setdefault((record['language'], record['length']), []).append(record)
+            tags = set(record['tags'])
+            unique_tags.update(tags)
+            for tag in tags:
+                self.index.setdefault((tag, record['language'], record['length']), []).append(record)
+        self.unique_tags = list(unique_tags)
+
+    def build_tag_matcher(self):
+        """Maps each lowercased tag to its (position in get_tags(), tag) pairs for find_tags."""
+        self._tags_by_text = {}
+        for position, tag in enumerate(self.unique_tags):
+            self._tags_by_text.setdefault(tag.lower(), []).append((position, tag))
+        self._max_tag_length = max(map(len, self._tags_by_text), default=0)
+
+    def find_tags(self, text):
+        """Returns the tags mentioned in the text as whole words, ignoring case, in get_tags() order.
+
+        Same matches as searching for r"\b<tag>\b" with every tag, but only the spans between
+        word boundaries of the text are looked up, so the cost does not grow with the tag count.
+        """
+        text = text.lower()
+        boundaries = [match.start() for match in re.finditer(r"\b", text)]
+        found = set()
+        for i, start in enumerate(boundaries):
+            for end in boundaries[i + 1:]:
+                if end - start > self._max_tag_length:
+                    break
+                found.update(self._tags_by_text.get(text[start:end], ()))
+        return [tag for _, tag in sorted(found)]
+
+    def get_filtered_posts(self, length, language, tag, limit=None):
+        # Single dictionary lookup; best engagement first, at most `limit` posts
+        return list(self.index.get((tag, language, length), [])[:limit])
+
+    def get_posts_by_style(self, length, language, limit=None):
+        # Any tag; used when no tag matches the requested topic
+        return list(self.style_index.get((language, length), [])[:limit])
+
+    def semantic_search(self, query, length=None, language=None, k=5, min_similarity=0.0):
+        # Most similar posts first, within the given length/language; empty without a vector index
+        if self.vector_index is None:
+            return []
+        hits = self.vector_index.search(query, k, language=language, length=length)
+        return [self.get_post(row) for row, score in hits if score >= min_similarity]
 
     def categorize_length(self, line_count):
-        if line_count < 5:
-            return "Short"
-        elif 5 <= line_count <= 10:
-            return "Medium"
-        else:
-            return "Long"
+        return categorize_length(line_count)
 
     def get_tags(self):
         return self.unique_tags
 
 
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_few_shot_posts(file_path=None):
+    """Returns a process-wide FewShotPosts for file_path, reloaded only when the file or its vector index changes.
+
+    Defaults to AUTOPOST_POSTS_FILE, else data/processed_posts.json; point it at a .apcol file
+    (preprocess.py --columnar) to memory-map a large corpus instead of parsing JSON.
+    """
+    file_path = file_path or os.getenv("AUTOPOST_POSTS_FILE", "data/processed_posts.json")
+    stat = os.stat(file_path)
+    index_file = vector_index_path(file_path) + ".npz"
+    index_stat = os.stat(index_file) if os.path.exists(index_file) else None
+    signature = (stat.st_mtime_ns, stat.st_size, index_stat and index_stat.st_mtime_ns)
+    key = os.path.abspath(file_path)
+    # Loading under the lock means concurrent sessions wait for one load instead of each parsing the file
+    with _stores_lock:
+        cached = _stores.get(key)
+        if cached is None or cached[0] != signature:
+            few_shot_posts = FewShotPosts(file_path)
+            # Loading may have (re)built the index; record its new mtime so the next call does not reload
+            index_stat = os.stat(index_file) if os.path.exists(index_file) else None
+            cached = ((stat.st_mtime_ns, stat.st_size, index_stat and index_stat.st_mtime_ns), few_shot_posts)
+            _stores[key] = cached
+        return cached[1]
+
+
 if __name__ == "__main__":
     fs = FewShotPosts()
     # print(fs.get_tags())
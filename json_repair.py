@@ -0,0 +1,204 @@
+import json
+import re
+
+# Values accepted for the metadata "language" field
+LANGUAGES = ("English", "Tanglish")
+
+_FENCE = re.compile(r"```[A-Za-z]*\s*\n?(.*?)(?:```|$)", re.DOTALL)
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_JSON_LITERALS = {"true", "false", "null"}
+_DECODER = json.JSONDecoder()
+
+
+class JSONRepairError(ValueError):
+    """Raised when an LLM reply cannot be repaired into JSON or does not fit the expected schema."""
+
+
+def loads(text):
+    """Parses JSON from an LLM reply, repairing common defects locally.
+
+    Returns (value, repairs), where repairs lists what had to be fixed: "code_fence",
+    "extra_prose", "single_quotes", "trailing_comma", "python_literals", "unquoted_strings",
+    "unclosed_brackets". Valid JSON is returned with no repairs. Raises JSONRepairError if
+    no JSON value can be recovered.
+    """
+
+    repairs = []
+    text = text.strip()
+    fenced = _FENCE.search(text)
+    if fenced:
+        repairs.append("code_fence")
+        if text[:fenced.start()].strip() or text[fenced.end():].strip():
+            repairs.append("extra_prose")
+        text = fenced.group(1).strip()
+
+    try:
+        return json.loads(text), repairs
+    except ValueError:
+        pass
+
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        raise JSONRepairError(f"No JSON object or array in: {text[:80]!r}")
+    start = min(starts)
+
+    try:
+        # A complete value at the first bracket wins, even if the prose after it has brackets too
+        value = _DECODER.raw_decode(text, start)[0]
+        if "extra_prose" not in repairs:
+            repairs.append("extra_prose")  # json.loads failed on the whole text, so there was prose around it
+        return value, repairs
+    except ValueError:
+        pass
+
+    end = max(text.rfind("}"), text.rfind("]"))
+    body = text[start:end + 1] if end > start else text[start:]
+    if (start or text[start + len(body):].strip()) and "extra_prose" not in repairs:
+        repairs.append("extra_prose")
+
+    try:
+        return json.loads(_normalize(body, repairs), strict=False), repairs
+    except ValueError as e:
+        raise JSONRepairError(f"Unrepairable JSON ({e}): {body[:80]!r}")
+
+
+def _normalize(text, repairs):
+    """Rewrites almost-JSON into JSON in one pass, adding each kind of fix made to `repairs`."""
+
+    def repaired(kind):
+        if kind not in repairs:
+            repairs.append(kind)
+
+    out = []
+    closers = []
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char in "\"'":
+            content, i, terminated = _read_string(text, i)
+            if char == "'":
+                repaired("single_quotes")
+            if not terminated:
+                repaired("unclosed_brackets")
+            out.append(f'"{content}"')
+            continue
+        if char in "{[":
+            closers.append("}" if char == "{" else "]")
+        elif char in "}]":
+            if _drop_trailing_comma(out):
+                repaired("trailing_comma")
+            if char not in closers:
+                repaired("unclosed_brackets")  # Stray closer
+                i += 1
+                continue
+            while closers[-1] != char:  # Close whatever was left open inside it
+                repaired("unclosed_brackets")
+                out.append(closers.pop())
+            closers.pop()
+        elif char.isalpha() or char == "_":
+            match = re.match(r"\w+", text[i:])
+            word = match.group()
+            if word in _PYTHON_LITERALS:
+                repaired("python_literals")
+                out.append(_PYTHON_LITERALS[word])
+            elif word in _JSON_LITERALS:
+                out.append(word)
+            else:
+                repaired("unquoted_strings")
+                out.append(json.dumps(word))
+            i += len(word)
+            continue
+        out.append(char)
+        i += 1
+
+    if closers:
+        repaired("unclosed_brackets")
+        _drop_trailing_comma(out)
+        out.extend(reversed(closers))
+    return "".join(out)
+
+
+def _read_string(text, start):
+    """Reads a single- or double-quoted string; returns (JSON-escaped content, end index, terminated).
+
+    Only a quote followed by a delimiter ends the string, so apostrophes and unescaped inner
+    quotes survive.
+    """
+
+    quote = text[start]
+    chars = []
+    i = start + 1
+    while i < len(text):
+        char = text[i]
+        if char == "\\" and i + 1 < len(text):
+            escaped = text[i + 1]
+            chars.append(escaped if escaped == "'" else char + escaped)
+            i += 2
+            continue
+        if char == quote and re.match(r"\s*(?:[,:\]}]|$)", text[i + 1:]):
+            return "".join(chars), i + 1, True  # A quote followed by anything else is part of the text (e.g. "don't")
+        chars.append('\\"' if char == '"' else char)
+        i += 1
+    return "".join(chars), i, False
+
+
+def _drop_trailing_comma(out):
+    j = len(out) - 1
+    while j >= 0 and out[j].isspace():
+        j -= 1
+    if j >= 0 and out[j] == ",":
+        del out[j]
+        return True
+    return False
+
+
+def validate_metadata(record, required=("tags",)):
+    """Checks extracted post metadata against its schema, coercing near misses.
+
+    line_count must be an int ("7" or "7 lines" is coerced), language one of LANGUAGES (any
+    case), profession a string and tags a list of strings (a comma-separated string is split).
+    Returns (clean record, repairs); raises JSONRepairError if the record does not fit or a
+    `required` field is missing.
+    """
+
+    if not isinstance(record, dict):
+        raise JSONRepairError(f"Expected a JSON object, got {type(record).__name__}")
+    missing = [field for field in required if field not in record]
+    if missing:
+        raise JSONRepairError(f"Missing fields: {', '.join(missing)}")
+
+    record = dict(record)
+    repairs = []
+
+    if "line_count" in record and type(record["line_count"]) is not int:
+        match = re.match(r"\s*(\d+)", str(record["line_count"]))
+        if not match:
+            raise JSONRepairError(f"line_count is not a number: {record['line_count']!r}")
+        record["line_count"] = int(match.group(1))
+        repairs.append("coerced_line_count")
+
+    if "language" in record:
+        language = next((name for name in LANGUAGES if name.lower() == str(record["language"]).strip().lower()), None)
+        if language is None:
+            raise JSONRepairError(f"Unknown language: {record['language']!r}")
+        if language != record["language"]:
+            repairs.append("coerced_language")
+        record["language"] = language
+
+    if "profession" in record and not isinstance(record["profession"], str):
+        record["profession"] = "General" if record["profession"] is None else str(record["profession"])
+        repairs.append("coerced_profession")
+
+    if "tags" in record:
+        tags = record["tags"]
+        if isinstance(tags, str):
+            tags = re.split(r"[,;]", tags)
+            repairs.append("coerced_tags")
+        if not isinstance(tags, list):
+            raise JSONRepairError(f"tags is not a list: {tags!r}")
+        clean = [str(tag).strip() for tag in tags if isinstance(tag, (str, int, float)) and str(tag).strip()]
+        if len(clean) != len(tags) and "coerced_tags" not in repairs:
+            repairs.append("coerced_tags")
+        record["tags"] = clean
+
+    return record, repairs
@@ -0,0 +1,118 @@
+import math
+import re
+from collections import Counter
+from tanglish import load_corrections
+
+# Post is Tanglish when at least this share of its words (and TANGLISH_MIN_WORDS words) read as romanized Tamil
+TANGLISH_MIN_RATIO = 0.08
+TANGLISH_MIN_WORDS = 2
+
+# Common romanized Tamil words missing from the correction dictionary
+TAMIL_SEED_WORDS = (
+    "aana", "ana", "oda", "dhaan", "un", "unaku", "unakku", "enakku", "avanga", "ivanga", "iruka", "irunthen",
+    "mattum", "yaarum", "sollu", "solluvaanga", "solranga", "laam", "adhu", "idhu", "enna", "ellarum", "nala",
+    "nenacha", "mudiyuma", "munaadi", "kuduka", "porathu", "avlo", "apdiye", "venuma", "theriyuma", "va",
+)
+
+# Common English words, including the English words used inside the correction dictionary's phrases
+ENGLISH_WORDS = frozenset("""
+a about after again all also always am an and any apply are as ask at be because been before being best better
+big both bro build but by call can career challenge chance change check come company confirm connect could current
+daily day decide decision deserve develop did dm do does doubt down each even every experience fail feel find first
+focus for free from full get give go going good great growth had handle has have he help her here high him his
+how i if improve improvement in interview into is it its job just keep know last learn less let level life light
+like made mail make manage many matter me mindset more most much must my need network never new news next no
+not now of off on one only or other our out over people plan positive pressure real relax reply resume right
+same say search see self set she should simple situation skill skills so some something speech speed start
+still stress success super support take team tension than that the their them then there these they thing think
+this those time to too tough try under up us use very want was way we well were what when where which while who
+why will win with work would year years yes you your
+""".split())
+
+_WORD = re.compile(r"[a-z]+")
+
+
+def count_lines(text):
+    """Counts the non-blank lines of a post (blank lines only separate paragraphs)."""
+
+    return sum(1 for line in text.splitlines() if line.strip())
+
+
+def _word_ngrams(word, n=3):
+    padded = f"<{word}>"
+    return [padded[i:i + n] for i in range(len(padded) - n + 1)]
+
+
+class LanguageDetector:
+    """Tells English from Tanglish posts locally, without an LLM call.
+
+    Words found in the romanized Tamil lexicon (the correction dictionary's vocabulary plus a
+    few seed words) or the English word list are counted directly. Other words are scored by a
+    character trigram naive Bayes model trained on both lists, so inflections such as
+    "pannuvom" or "kedaikkuma" are recognised without being listed.
+    """
+
+    def __init__(self, corrections=None, min_ratio=TANGLISH_MIN_RATIO, min_words=TANGLISH_MIN_WORDS):
+        corrections = load_corrections() if corrections is None else corrections
+        vocabulary = {word for phrase in [*corrections, *corrections.values()] for word in _WORD.findall(phrase.lower())}
+        self.tamil_words = (vocabulary | set(TAMIL_SEED_WORDS)) - ENGLISH_WORDS
+        self.min_ratio = min_ratio
+        self.min_words = min_words
+
+        self.tamil_grams = Counter(gram for word in self.tamil_words for gram in _word_ngrams(word))
+        self.english_grams = Counter(gram for word in ENGLISH_WORDS for gram in _word_ngrams(word))
+        self.tamil_total = sum(self.tamil_grams.values())
+        self.english_total = sum(self.english_grams.values())
+        self.vocabulary_size = len(self.tamil_grams.keys() | self.english_grams.keys()) + 1
+        self._verdicts = {}  # Word -> is_tamil_word(word); posts repeat most of their vocabulary
+
+    def is_tamil_word(self, word):
+        verdict = self._verdicts.get(word)
+        if verdict is None:
+            verdict = self._verdicts[word] = self._classify_word(word)
+        return verdict
+
+    def _classify_word(self, word):
+        if word in self.tamil_words:
+            return True
+        if word in ENGLISH_WORDS or len(word) < 4:
+            return False  # Short unknown words carry too few n-grams to judge
+        grams = _word_ngrams(word)
+        score = sum(
+            math.log((self.tamil_grams[gram] + 1) / (self.tamil_total + self.vocabulary_size))
+            - math.log((self.english_grams[gram] + 1) / (self.english_total + self.vocabulary_size))
+            for gram in grams
+        )
+        return score / len(grams) > 1.0  # Clear per-n-gram margin, so unseen English words stay English
+
+    def tamil_ratio(self, text):
+        """Returns (romanized Tamil words, total words) for the text."""
+
+        words = _WORD.findall(text.lower())
+        return sum(1 for word in words if self.is_tamil_word(word)), len(words)
+
+    def detect(self, text):
+        """Returns "Tanglish" or "English"."""
+
+        tamil, total = self.tamil_ratio(text)
+        if total and tamil >= self.min_words and tamil / total >= self.min_ratio:
+            return "Tanglish"
+        return "English"
+
+
+_detector = None
+
+
+def get_detector():
+    """Returns the shared detector built from data/tanglish_corrections.json."""
+
+    global _detector
+    if _detector is None:
+        _detector = LanguageDetector()
+    return _detector
+
+
+def local_metadata(text):
+    """Computes the metadata fields that need no LLM: line_count and language."""
+
+    return {"line_count": count_lines(text), "language": get_detector().detect(text)}
@@ -0,0 +1,201 @@
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+# Any LangChain chat model works as a backend: the pipeline only relies on the Runnable
+# interface (invoke, ainvoke, stream, batch) and on `prompt | llm` chains.
+
+
+class StubLLMError(Exception):
+    """Injected transient failure from the stub backend."""
+
+
+class StubRateLimitError(StubLLMError):
+    """Injected 429 from the stub backend; carries a Retry-After like the real API."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"429 Too Many Requests (retry after {retry_after}s)")
+        self.retry_after = retry_after
+
+
+class StubChatModel(BaseChatModel):
+    """Deterministic offline chat model for benchmarks and tests.
+
+    Replies are produced locally by `responder` (default: `default_responder`, which
+    understands the metadata, batch and tag-cluster naming prompts). `latency` is added before
+    the first token, `tokens_per_second` paces the output (0 = instant), and
+    `failure_rate` / `rate_limit_rate` inject errors from a seeded RNG.
+    """
+
+    latency: float = 0.0
+    tokens_per_second: float = 0.0
+    failure_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: float = 1.0
+    seed: int = 0
+    responder: Optional[Callable[[str], str]] = None
+    model_name: str = "stub"
+
+    _rng: Any = PrivateAttr(default=None)
+    _lock: Any = PrivateAttr(default=None)
+    _calls: int = PrivateAttr(default=0)
+
+    def model_post_init(self, __context):
+        self._rng = random.Random(self.seed)
+        self._lock = threading.Lock()
+
+    @property
+    def _llm_type(self):
+        return "stub"
+
+    @property
+    def calls(self):
+        """Number of requests received so far (including injected failures)."""
+        return self._calls
+
+    def _reply(self, messages):
+        with self._lock:
+            self._calls += 1
+            roll = self._rng.random()
+        if roll < self.rate_limit_rate:
+            raise StubRateLimitError(self.retry_after)
+        if roll < self.rate_limit_rate + self.failure_rate:
+            raise StubLLMError("Injected stub failure")
+
+        prompt = "\n".join(str(message.content) for message in messages)
+        text = (self.responder or default_responder)(prompt)
+        tokens = re.findall(r"\S+\s*|\s+", text)
+        usage = {
+            "input_tokens": max(1, len(prompt) // 4),
+            "output_tokens": len(tokens),
+            "total_tokens": max(1, len(prompt) // 4) + len(tokens),
+        }
+        return text, tokens, usage
+
+    def _token_delay(self):
+        return 1.0 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        text, tokens, usage = self._reply(messages)
+        time.sleep(self._token_delay() * len(tokens))
+        message = AIMessage(content=text, usage_metadata=usage, response_metadata={"model_name": self.model_name})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        text, tokens, usage = self._reply(messages)
+        await asyncio.sleep(self._token_delay() * len(tokens))
+        message = AIMessage(content=text, usage_metadata=usage, response_metadata={"model_name": self.model_name})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        text, tokens, usage = self._reply(messages)
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(self._token_delay())
+            chunk = AIMessageChunk(content=token, usage_metadata=usage if i == len(tokens) - 1 else None)
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        text, tokens, usage = self._reply(messages)
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(self._token_delay())
+            chunk = AIMessageChunk(content=token, usage_metadata=usage if i == len(tokens) - 1 else None)
+            yield ChatGenerationChunk(message=chunk)
+
+
+_STOPWORDS = {
+    "about", "after", "again", "always", "because", "before", "being", "could", "doesn't", "every",
+    "first", "going", "might", "never", "other", "people", "really", "should", "something", "their",
+    "there", "these", "thing", "things", "think", "those", "through", "today", "what's", "where",
+    "which", "while", "without", "would", "you're",
+}
+
+_POST_WORDS = (
+    "growth learning career journey team skills project impact lessons progress mentor "
+    "challenge community feedback consistency curiosity milestone opportunity"
+).split()
+
+
+def default_responder(prompt):
+    """Builds a plausible reply for the prompts used in this repo, derived only from the prompt text."""
+
+    if "### Post " in prompt:
+        posts = re.split(r"### Post (\d+)\n", prompt.split("Here are the posts:", 1)[-1])
+        return json.dumps([
+            {"id": int(posts[i]), **_stub_metadata(posts[i + 1])}
+            for i in range(1, len(posts) - 1, 2)
+        ])
+    if "**Tag Groups:**" in prompt:
+        groups = re.findall(r"^\s*(\d+)\. (.+)$", prompt.split("**Tag Groups:**", 1)[1], re.MULTILINE)
+        return json.dumps({
+            number: min(group.split(" | "), key=lambda tag: (len(tag), tag)).strip().title()
+            for number, group in groups
+        })
+    if "Here is the actual post:" in prompt:
+        return json.dumps(_stub_metadata(prompt.split("Here is the actual post:", 1)[1]))
+    return _stub_post(prompt)
+
+
+def _stub_metadata(post):
+    post = post.strip()
+    words = re.findall(r"[A-Za-z']{5,}", post.lower())
+    counts = {}
+    for word in words:
+        if word not in _STOPWORDS:
+            counts[word] = counts.get(word, 0) + 1
+    tags = [word.title() for word, _ in sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:2]]
+    return {
+        "profession": "General",
+        "tags": tags or ["General"],
+    }
+
+
+def _stub_post(prompt):
+    rng = random.Random(prompt)
+    match = re.search(r"(\d+) to (\d+) lines", prompt)
+    low, high = (int(match.group(1)), int(match.group(2))) if match else (6, 10)
+    topic = re.search(r"\*\*Topic\*\*: (.+)", prompt)
+    topic = topic.group(1).strip() if topic else "my work"
+    lines = []
+    for i in range(rng.randint(low, high)):
+        words = rng.sample(_POST_WORDS, 6)
+        lines.append(f"{'Thoughts on ' + topic + ': ' if i == 0 else ''}{' '.join(words).capitalize()}.")
+    return "\n".join(lines)
+
+
+def create_llm(backend, api_key=None, model_name=None):
+    """Creates the chat model for a backend name: 'groq' (default) or 'stub'.
+
+    Stub settings come from AUTOPOST_STUB_LATENCY, AUTOPOST_STUB_TOKENS_PER_SECOND,
+    AUTOPOST_STUB_FAILURE_RATE, AUTOPOST_STUB_RATE_LIMIT_RATE and AUTOPOST_STUB_SEED.
+    """
+
+    if backend == "stub":
+        return StubChatModel(
+            latency=float(os.getenv("AUTOPOST_STUB_LATENCY", "0")),
+            tokens_per_second=float(os.getenv("AUTOPOST_STUB_TOKENS_PER_SECOND", "0")),
+            failure_rate=float(os.getenv("AUTOPOST_STUB_FAILURE_RATE", "0")),
+            rate_limit_rate=float(os.getenv("AUTOPOST_STUB_RATE_LIMIT_RATE", "0")),
+            seed=int(os.getenv("AUTOPOST_STUB_SEED", "0")),
+        )
+    if backend == "groq":
+        from langchain_groq import ChatGroq
+        return ChatGroq(groq_api_key=api_key, model_name=model_name)
+    raise ValueError(f"Unknown LLM backend: {backend!r}")
@@ -1,42 +1,174 @@
-from langchain_groq import ChatGroq
+import contextvars
 import os
-import streamlit as st
+import threading
 from dotenv import load_dotenv
+from rate_limiter import get_default_limiter, call_with_retries
+from metrics import llm_call
 
 # Load environment variables (if running locally)
 load_dotenv()
 
-# Sidebar input for API key (hidden for security)
-st.sidebar.header("🔐 Enter Your Groq API Key")
-user_api_key = st.sidebar.text_input("API Key", type="password")
+# Groq model used by every LLM call (also part of cache keys)
+MODEL_NAME = "llama3-8b-8192"
 
-# Store API key in session state
-if user_api_key:
-    st.session_state["GROQ_API_KEY"] = user_api_key
-    st.sidebar.success("✅ API Key Set Successfully!")
-else:
-    st.sidebar.warning("⚠️ Please enter your API key to proceed.")
+# API key chosen by the current UI session; falls back to the GROQ_API_KEY environment variable
+_session_api_key = contextvars.ContextVar("groq_api_key", default=None)
 
-# Fetch API key (priority: user input → environment variable)
-api_key = st.session_state.get("GROQ_API_KEY") or os.getenv("GROQ_API_KEY")
+# One client per (backend, API key), created on first use
+_clients = {}
+_clients_lock = threading.Lock()
+_llm_override = None
 
-# Ensure API key is present before making API calls
-if not api_key:
-    st.error("❌ API Key is missing! Please enter it in the sidebar.")
-    st.stop()
+def set_api_key(api_key):
+    """Uses this API key for LLM calls made from the current thread/context (e.g. a Streamlit session)."""
 
-# Initialize LLM with error handling
-try:
-    llm = ChatGroq(groq_api_key=api_key, model_name="llama3-8b-8192")
-except Exception as e:
-    st.error(f"❌ Failed to connect to Groq API: {e}")
-    st.stop()
+    _session_api_key.set(api_key or None)
+
+def get_api_key():
+    """Returns the API key for the current context (session key first, then environment)."""
+
+    return _session_api_key.get() or os.getenv("GROQ_API_KEY")
+
+def get_backend_name():
+    """Returns the configured LLM backend: 'groq' (default) or 'stub' (offline, see llm_backends)."""
+
+    return os.getenv("AUTOPOST_LLM_BACKEND", "groq")
+
+def set_llm(llm):
+    """Routes every LLM call to the given LangChain chat model (None restores the configured backend)."""
+
+    global _llm_override
+    _llm_override = llm
+
+def get_model_name():
+    """Name of the model answering calls; part of cache keys so backends never share entries."""
+
+    if _llm_override is not None:
+        return getattr(_llm_override, "model_name", type(_llm_override).__name__)
+    if get_backend_name() == "stub":
+        return "stub"
+    return MODEL_NAME
+
+def get_llm():
+    """Returns the shared chat model for the current backend and API key, creating it on first use.
+
+    Thread-safe; LangChain and the provider SDK are only imported here, so importing this
+    module stays cheap.
+    """
+
+    if _llm_override is not None:
+        return _llm_override
+
+    backend = get_backend_name()
+    api_key = get_api_key()
+    if backend == "groq" and not api_key:
+        raise RuntimeError("GROQ_API_KEY is not set. Enter it in the sidebar or set the environment variable.")
+
+    with _clients_lock:
+        client = _clients.get((backend, api_key))
+        if client is None:
+            from llm_backends import create_llm
+            client = create_llm(backend, api_key=api_key, model_name=MODEL_NAME)
+            _clients[(backend, api_key)] = client
+        return client
+
+def get_limiter():
+    """Returns the rate limiter for the current context's API key (see rate_limiter.get_default_limiter)."""
+
+    return get_default_limiter(get_api_key())
+
+def __getattr__(name):
+    # Keeps `llm_helper.llm` working for existing callers without building a client at import time
+    if name == "llm":
+        return get_llm()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Completion tokens reserved for a generated post when checking the tokens-per-minute quota;
+# the reservation is settled against the actual usage once the call returns
+COMPLETION_TOKEN_ALLOWANCE = 512
+
+def estimate_tokens(text):
+    """Cheap token estimate (about 4 characters per token) used for prompt budgeting."""
+
+    return max(1, len(text) // 4)
+
+def usage_tokens(message, prompt_tokens):
+    """Returns (prompt, completion) tokens from the provider's usage metadata, or estimates them."""
+
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", prompt_tokens), usage.get("output_tokens", 0)
+    return prompt_tokens, estimate_tokens(str(getattr(message, "content", "")))
+
+def limited_call(call, func, prompt_tokens, completion_tokens=COMPLETION_TOKEN_ALLOWANCE, max_retries=3):
+    """Runs `func()` within the current API key's rate limit, retrying failures.
+
+    The prompt plus `completion_tokens` (the expected reply length) is reserved against the
+    tokens-per-minute quota. Returns (result, record_usage); call record_usage(prompt, completion)
+    once the actual usage is known to record it on `call` (see metrics.llm_call) and refund or
+    charge the difference.
+    """
+
+    limiter = get_limiter()
+    reserved = prompt_tokens + completion_tokens
+    result = call_with_retries(call.counted(func), limiter, tokens=reserved, max_retries=max_retries)
+
+    def record_usage(prompt_used, completion_used):
+        call.set_tokens(prompt_used, completion_used)
+        if limiter:
+            limiter.settle(reserved, prompt_used + completion_used)
+
+    return result, record_usage
+
+def invoke_llm(prompt, operation="generate_post", completion_tokens=COMPLETION_TOKEN_ALLOWANCE):
+    """Sends a prompt to the LLM within the shared rate limit and returns the text; raises on failure.
+
+    `completion_tokens` is the expected reply length reserved against the tokens-per-minute quota.
+    """
+
+    llm = get_llm()
+    with llm_call(operation) as call:
+        prompt_tokens = estimate_tokens(prompt)
+        response, record_usage = limited_call(call, lambda: llm.invoke(prompt), prompt_tokens, completion_tokens)
+        record_usage(*usage_tokens(response, prompt_tokens))
+        return response.content
+
+def stream_llm(prompt, operation="generate_post_stream", completion_tokens=COMPLETION_TOKEN_ALLOWANCE):
+    """Yields completion text chunks as the LLM produces them.
+
+    Rate limiting and retries cover the call up to its first chunk; an error after
+    streaming has started is raised to the caller.
+    """
+
+    llm = get_llm()
+    with llm_call(operation) as call:
+        prompt_tokens = estimate_tokens(prompt)
+
+        def start_stream():
+            stream = iter(llm.stream(prompt))
+            return next(stream, None), stream
+
+        (first, stream), record_usage = limited_call(call, start_stream, prompt_tokens, completion_tokens)
+        if first is None:
+            record_usage(prompt_tokens, 0)
+            return
+        text = [first.content]
+        usage = first.usage_metadata
+        yield first.content
+        for chunk in stream:
+            text.append(chunk.content)
+            usage = chunk.usage_metadata or usage  # Providers report usage on the last chunk
+            yield chunk.content
+
+        if usage:
+            record_usage(usage.get("input_tokens", prompt_tokens), usage.get("output_tokens", 0))
+        else:
+            record_usage(prompt_tokens, estimate_tokens("".join(text)))
 
 # Function to generate response
 def generate_response(prompt):
     try:
-        response = llm.invoke(prompt)
-        return response.content
+        return invoke_llm(prompt)
     except Exception as e:
         return f"❌ Error: {e}"
 
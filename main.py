@@ -1,7 +1,9 @@
 import streamlit as st
 import os
-from few_shot import FewShotPosts
-from post_generator import generate_post
+from few_shot import get_few_shot_posts
+from post_generator import generate_post_stream, create_post_candidates
+from llm_helper import set_api_key, get_llm
+from metrics import configure_from_env
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -404,10 +406,66 @@ post_purposes = [
 length_options = ["Short", "Medium", "Long"]
 language_options = ["English", "Tanglish"]
 
+def render_api_key_sidebar():
+    """Asks for the Groq API key in the sidebar and registers it for this session's LLM calls."""
+    # Sidebar input for API key (hidden for security)
+    st.sidebar.header("🔐 Enter Your Groq API Key")
+    user_api_key = st.sidebar.text_input("API Key", type="password")
+
+    # Store API key in session state
+    if user_api_key:
+        st.session_state["GROQ_API_KEY"] = user_api_key
+        st.sidebar.success("✅ API Key Set Successfully!")
+    else:
+        st.sidebar.warning("⚠️ Please enter your API key to proceed.")
+
+    # Fetch API key (priority: user input → environment variable)
+    api_key = st.session_state.get("GROQ_API_KEY") or os.getenv("GROQ_API_KEY")
+
+    # Ensure API key is present before making API calls
+    if not api_key:
+        st.error("❌ API Key is missing! Please enter it in the sidebar.")
+        st.stop()
+
+    set_api_key(api_key)
+
+    # Initialize LLM with error handling
+    try:
+        get_llm()
+    except Exception as e:
+        st.error(f"❌ Failed to connect to Groq API: {e}")
+        st.stop()
+
+def render_post(drafts, post_length, language, topic, profession, purpose, custom_keywords, fresh=False):
+    """Streams one post, or writes several drafts at once and shows the best with the others one click away."""
+    if drafts <= 1:
+        st.write_stream(generate_post_stream(post_length, language, topic, profession, purpose, custom_keywords, fresh=fresh))
+        return
+
+    try:
+        with st.spinner(f"✍️ Writing {drafts} drafts..."):
+            candidates = create_post_candidates(post_length, language, topic, profession, purpose, custom_keywords, n=drafts)
+    except ValueError as e:
+        st.error(str(e))
+        return
+    except Exception as e:
+        st.error(f"⚠️ Error generating post: {str(e)}")
+        return
+
+    st.write(candidates[0]["text"])
+    if len(candidates) > 1:
+        with st.expander(f"🔁 {len(candidates) - 1} alternative draft(s)"):
+            tabs = st.tabs([f"Draft {i}" for i in range(2, len(candidates) + 1)])
+            for tab, candidate in zip(tabs, candidates[1:]):
+                with tab:
+                    st.write(candidate["text"])
+
 def main():
     """Main function to render the Streamlit app."""
     st.subheader("🚀 AutoPost-AI - An AI Powered LinkedIn Post Generator")
-    fs = FewShotPosts()
+    configure_from_env()  # Optional metrics endpoint/file, started once per process
+    render_api_key_sidebar()
+    fs = get_few_shot_posts()  # Shared across reruns and sessions
 
     # Ensure session state has valid keys
     if "selected_category" not in st.session_state:
@@ -445,10 +503,13 @@ def main():
         # Select Purpose
         selected_purpose = st.selectbox("🎯 Select Purpose of Post:", options=post_purposes)
 
+        fresh_variant = st.checkbox("🔄 Fresh variant", help="Skip previously generated posts and write a new version.")
+        drafts = st.slider("📝 Drafts", min_value=1, max_value=5, value=1, help="Write several drafts at once and show the best first.")
+
         # Generate Post Button
         if st.button("⚡ Generate Post"):
-            post = generate_post(selected_length, selected_language, selected_topic, selected_purpose, custom_keywords)
-            st.write(post)
+            # Personal Growth has no profession selector, so a generic one is used
+            render_post(drafts, selected_length, selected_language, selected_topic, "Professional", selected_purpose, custom_keywords, fresh=fresh_variant)
         return  # Exit function early since subcategory/profession is not needed
 
     # **For other categories (Technical, Business, etc.)**
@@ -492,10 +553,12 @@ def main():
     with col7:
         custom_keywords = st.text_input("🔑 Add Specific Keywords (Optional)", help="Enter keywords to fine-tune the generated post.")
 
+    fresh_variant = st.checkbox("🔄 Fresh variant", help="Skip previously generated posts and write a new version.")
+    drafts = st.slider("📝 Drafts", min_value=1, max_value=5, value=1, help="Write several drafts at once and show the best first.")
+
     # **Generate Post Button**
     if st.button("⚡ Generate Post"):
-        post = generate_post(selected_length, selected_language, selected_topic, selected_profession, selected_purpose, custom_keywords)
-        st.write(post)
+        render_post(drafts, selected_length, selected_language, selected_topic, selected_profession, selected_purpose, custom_keywords, fresh=fresh_variant)
 
 if __name__ == "__main__":
     main()
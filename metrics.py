@@ -0,0 +1,220 @@
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MetricsRegistry:
+    """Thread-safe in-process store of counters and summaries (count, sum, max) keyed by name and labels."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._summaries = {}
+
+    def inc(self, name, labels=None, value=1):
+        """Adds `value` to a counter."""
+
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=None):
+        """Records one observation (e.g. a duration in seconds) in a summary."""
+
+        key = (name, _label_key(labels))
+        with self._lock:
+            count, total, largest = self._summaries.get(key, (0, 0.0, value))
+            self._summaries[key] = (count + 1, total + value, max(largest, value))
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._summaries.clear()
+
+    def snapshot(self):
+        """Returns every metric as a JSON-serialisable dict."""
+
+        with self._lock:
+            counters = sorted(self._counters.items())
+            summaries = sorted(self._summaries.items())
+        report = {"counters": {}, "summaries": {}}
+        for (name, labels), value in counters:
+            report["counters"].setdefault(name, []).append({"labels": dict(labels), "value": value})
+        for (name, labels), (count, total, largest) in summaries:
+            report["summaries"].setdefault(name, []).append({
+                "labels": dict(labels), "count": count, "sum": total, "max": largest, "mean": total / count,
+            })
+        return report
+
+    def to_prometheus(self):
+        """Renders every metric in the Prometheus text exposition format."""
+
+        snapshot = self.snapshot()
+        lines = []
+        for name, series in snapshot["counters"].items():
+            lines.append(f"# TYPE {name} counter")
+            lines += [f"{name}{_format_labels(s['labels'])} {s['value']}" for s in series]
+        for name, series in snapshot["summaries"].items():
+            lines.append(f"# TYPE {name} summary")
+            for s in series:
+                labels = _format_labels(s["labels"])
+                lines.append(f"{name}_count{labels} {s['count']}")
+                lines.append(f"{name}_sum{labels} {s['sum']}")
+            lines.append(f"# TYPE {name}_max gauge")
+            lines += [f"{name}_max{_format_labels(s['labels'])} {s['max']}" for s in series]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Writes the metrics to a file: Prometheus text for .prom/.txt, JSON otherwise."""
+
+        if path.endswith((".prom", ".txt")):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.snapshot(), indent=2) + "\n"
+        tmp_path = path + ".tmp"
+        with open(tmp_path, mode="w", encoding="utf-8") as file:
+            file.write(content)
+        os.replace(tmp_path, path)  # Scrapers never see a half-written file
+
+
+def _label_key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+
+# Process-wide registry used by the instrumentation helpers below
+REGISTRY = MetricsRegistry()
+
+
+@contextmanager
+def span(stage, registry=None):
+    """Times a pipeline stage into `autopost_stage_seconds{stage=...}`."""
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        (registry or REGISTRY).observe("autopost_stage_seconds", time.perf_counter() - started, {"stage": stage})
+
+
+class LLMCall:
+    """Per-call measurements filled in by the caller inside `llm_call()`."""
+
+    def __init__(self):
+        self.attempts = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def counted(self, func):
+        """Wraps the per-attempt callable handed to call_with_retries so attempts are counted."""
+
+        def attempt():
+            self.attempts += 1
+            return func()
+        return attempt
+
+    def set_tokens(self, prompt_tokens, completion_tokens):
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+
+@contextmanager
+def llm_call(operation, registry=None):
+    """Records latency, attempts, retries, tokens and status of one (retried) LLM call.
+
+    Yields an LLMCall; wrap the attempt function with `call.counted()` and report usage
+    with `call.set_tokens()`. An exception escaping the block counts the call as an error.
+    """
+
+    registry = registry or REGISTRY
+    call = LLMCall()
+    started = time.perf_counter()
+    status = "error"
+    try:
+        yield call
+        status = "ok"
+    finally:
+        labels = {"operation": operation}
+        registry.observe("autopost_llm_call_seconds", time.perf_counter() - started, labels)
+        registry.inc("autopost_llm_calls_total", {**labels, "status": status})
+        registry.inc("autopost_llm_retries_total", labels, max(0, call.attempts - 1))
+        registry.observe("autopost_llm_prompt_tokens", call.prompt_tokens, labels)
+        registry.observe("autopost_llm_completion_tokens", call.completion_tokens, labels)
+
+
+def record_cache(operation, hit, registry=None):
+    """Counts a cache lookup as a hit or miss for an operation."""
+
+    (registry or REGISTRY).inc("autopost_cache_lookups_total", {"operation": operation, "result": "hit" if hit else "miss"})
+
+
+def record_json_repairs(operation, repairs, registry=None):
+    """Counts each kind of local repair applied to an LLM's JSON reply (see json_repair)."""
+
+    for repair in repairs:
+        (registry or REGISTRY).inc("autopost_json_repairs_total", {"operation": operation, "repair": repair})
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, content_type = self.registry.to_prometheus(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, content_type = json.dumps(self.registry.snapshot()), "application/json"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # Keep scrapes out of the console
+
+
+def serve(port, host="127.0.0.1", registry=None):
+    """Serves /metrics (Prometheus text) and /metrics.json from a background thread; returns the server."""
+
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry or REGISTRY})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+_configured = False
+_configured_lock = threading.Lock()
+
+
+def configure_from_env():
+    """Starts the exporters requested by AUTOPOST_METRICS_PORT and AUTOPOST_METRICS_FILE (once per process).
+
+    The port serves live metrics over HTTP; the file is written when the process exits.
+    """
+
+    global _configured
+    with _configured_lock:
+        if _configured:
+            return
+        _configured = True
+
+    port = os.getenv("AUTOPOST_METRICS_PORT")
+    if port:
+        serve(int(port))
+    path = os.getenv("AUTOPOST_METRICS_FILE")
+    if path:
+        atexit.register(REGISTRY.write, path)
@@ -1,6 +1,75 @@
+import contextvars
+import os
 import random
-from llm_helper import generate_response
-from preprocess import correct_tanglish_spelling
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from llm_helper import invoke_llm, stream_llm, estimate_tokens, get_model_name
+from preprocess import correct_tanglish_spelling, TANGLISH_CORRECTOR
+from few_shot import get_few_shot_posts
+from cache import create_cache, make_key
+from metrics import span, record_cache
+from language_detect import count_lines, get_detector
+from dedup import DEDUP_THRESHOLD, shingles
+from tag_unifier import similarity
+
+# Default prompt budget for few-shot examples (0 disables them)
+FEW_SHOT_TOKEN_BUDGET = 600
+FEW_SHOT_MAX_EXAMPLES = 3
+# Top-engagement posts fetched per matching tag; keeps lookups cheap on very large corpora
+FEW_SHOT_CANDIDATES_PER_TAG = 50
+# Semantic matches below this cosine similarity are treated as unrelated
+FEW_SHOT_MIN_SIMILARITY = 0.2
+
+# Drafts written side by side when the user asks for alternatives
+DEFAULT_CANDIDATES = 3
+# Share of romanized Tamil words at which a Tanglish draft gets the full language score
+TANGLISH_TARGET_RATIO = 0.25
+
+_generation_cache = None
+_generation_cache_ready = False
+_generation_cache_lock = threading.Lock()
+
+def get_generation_cache():
+    """
+    Returns the opt-in cache for generated posts, or None when caching is off.
+
+    Configured with AUTOPOST_GENERATION_CACHE ('memory' or a SQLite path shared by worker
+    processes), AUTOPOST_GENERATION_CACHE_TTL (seconds, default 86400) and
+    AUTOPOST_GENERATION_CACHE_SIZE (max entries, default 1024).
+    """
+    global _generation_cache, _generation_cache_ready
+    with _generation_cache_lock:
+        if not _generation_cache_ready:
+            _generation_cache = create_cache(
+                os.getenv("AUTOPOST_GENERATION_CACHE", ""),
+                namespace="generation",
+                max_entries=int(os.getenv("AUTOPOST_GENERATION_CACHE_SIZE", "1024")),
+                ttl=float(os.getenv("AUTOPOST_GENERATION_CACHE_TTL", "86400")),
+            )
+            _generation_cache_ready = True
+        return _generation_cache
+
+def set_generation_cache(cache):
+    """Replaces the generation cache (a MemoryCache, SQLiteCache or None to disable it)."""
+    global _generation_cache, _generation_cache_ready
+    with _generation_cache_lock:
+        _generation_cache = cache
+        _generation_cache_ready = True
+
+def normalize_input(value):
+    """Collapses whitespace so trivially different inputs share a cache entry."""
+    return " ".join(str(value or "").split())
+
+def trim_keywords(custom_keywords):
+    """Trims the whitespace around and inside each comma-separated keyword, keeping the user's case and order."""
+    keywords = (normalize_input(keyword) for keyword in str(custom_keywords or "").split(","))
+    return ", ".join(keyword for keyword in keywords if keyword)
+
+def normalize_keywords(custom_keywords):
+    """Normalizes a comma-separated keyword string: trimmed, lowercased, de-duplicated and sorted."""
+    keywords = {normalize_input(keyword).lower() for keyword in str(custom_keywords or "").split(",")}
+    return ", ".join(sorted(keywords - {""}))
 
 def get_length_str(length):
     """Maps the selected post length to a descriptive format."""
@@ -11,7 +80,68 @@ def get_length_str(length):
     }
     return length_map.get(length, "6 to 10 lines")  # Default to Medium
 
-def generate_post(post_length, language, topic, profession, post_reason, custom_keywords=""):
+def get_few_shot_examples(post_length, language, topic, post_reason, custom_keywords="", token_budget=FEW_SHOT_TOKEN_BUDGET, profession=""):
+    """
+    Picks example posts in the requested length and language.
+
+    Posts tagged with a tag mentioned in the topic, purpose or keywords are preferred, best
+    engagement first. Otherwise the posts most similar to the topic, profession and purpose
+    are used (when the corpus has a vector index), then any post of the same length and
+    language. Examples are added until the next one would exceed **token_budget** or
+    FEW_SHOT_MAX_EXAMPLES is reached.
+    """
+    if token_budget <= 0:
+        return []
+
+    try:
+        fs = get_few_shot_posts()
+    except FileNotFoundError:
+        return []
+
+    matching_tags = fs.find_tags(f" {topic} {post_reason} {custom_keywords} ")
+
+    candidates = []
+    for tag in matching_tags:
+        candidates.extend(fs.get_filtered_posts(post_length, language, tag, limit=FEW_SHOT_CANDIDATES_PER_TAG))
+    candidates.sort(key=lambda p: p.get("engagement", 0), reverse=True)
+    if not candidates:
+        # Topics outside the tag set (e.g. "Kubernetes"): most similar posts first
+        query = f"{topic} {profession} {post_reason} {custom_keywords}"
+        candidates = fs.semantic_search(query, post_length, language, k=FEW_SHOT_MAX_EXAMPLES * 3,
+                                        min_similarity=FEW_SHOT_MIN_SIMILARITY)
+    if not candidates:
+        candidates = fs.get_posts_by_style(post_length, language, limit=FEW_SHOT_CANDIDATES_PER_TAG)
+
+    examples = []
+    seen = set()
+    used = 0
+    for post in candidates:
+        if len(examples) >= FEW_SHOT_MAX_EXAMPLES:
+            break
+        if post["text"] in seen:
+            continue
+        cost = estimate_tokens(post["text"])
+        if used + cost > token_budget:
+            break
+        seen.add(post["text"])
+        examples.append(post["text"])
+        used += cost
+
+    return examples
+
+def format_few_shot_examples(examples):
+    """Formats example posts as a prompt section (empty when there are none)."""
+    if not examples:
+        return ""
+
+    blocks = "\n\n".join(f"Example {i}:\n{text}" for i, text in enumerate(examples, start=1))
+    return f"""
+    **Example Posts in the Requested Style** (match their tone, structure and length; do not copy them):
+
+    {blocks}
+    """
+
+def generate_post(post_length, language, topic, profession, post_reason, custom_keywords="", few_shot_token_budget=FEW_SHOT_TOKEN_BUDGET, fresh=False):
     """
     Generates a LinkedIn post that is highly relevant and unique.
 
@@ -21,18 +151,239 @@ def generate_post(post_length, language, topic, profession, post_reason, custom_
     - **profession**: User's selected profession
     - **post_reason**: The purpose of the post (e.g., "Completed a Course", "Landed a New Job")
     - **custom_keywords**: Additional keywords to fine-tune the post
+    - **few_shot_token_budget**: Prompt tokens available for few-shot example posts (0 disables them)
+    - **fresh**: Skip the generation cache (if enabled) and produce a new variant
 
     Returns:
         A unique LinkedIn post string.
     """
 
+    try:
+        return create_post(post_length, language, topic, profession, post_reason, custom_keywords, few_shot_token_budget, fresh)
+    except ValueError as e:
+        return str(e)
+    except Exception as e:
+        return f"⚠️ Error generating post: {str(e)}"
+
+def create_post(post_length, language, topic, profession, post_reason, custom_keywords="", few_shot_token_budget=FEW_SHOT_TOKEN_BUDGET, fresh=False):
+    """
+    Same as generate_post, but raises instead of returning error text.
+
+    Raises ValueError for missing inputs or an empty LLM response; LLM errors propagate.
+    Used by headless callers such as batch_generate.py that need a per-post status.
+    """
+
     # ✅ **Ensure all inputs are present**
+    error = validate_inputs(topic, profession, post_reason)
+    if error:
+        raise ValueError(error)
+
+    with span("generate_post.build_prompt"):
+        prompt, cache_key = prepare_request(post_length, language, topic, profession, post_reason, custom_keywords, few_shot_token_budget)
+
+    # ✅ **Serve Repeated Requests From the Cache (unless a fresh variant is asked for)**
+    cache = get_generation_cache()
+    if cache is not None and not fresh:
+        cached = cache.get(cache_key)
+        record_cache("generate_post", cached is not None)
+        if cached is not None:
+            return cached
+
+    # ✅ **Generate post using LLM**
+    response = invoke_llm(prompt)
+
+    # ✅ **Handle any API failures or empty responses**
+    if not response or not isinstance(response, str) or response.strip() == "":
+        raise ValueError("⚠️ Error: LLM response was empty. Please try again.")
+
+    # ✅ **Apply Tanglish Spelling Correction (if needed)**
+    if language == "Tanglish":
+        with span("generate_post.tanglish_correction"):
+            response = correct_tanglish_spelling(response)
+
+    post = response.strip()
+    if cache is not None:
+        cache.set(cache_key, post)
+    return post
+
+def generate_post_stream(post_length, language, topic, profession, post_reason, custom_keywords="", few_shot_token_budget=FEW_SHOT_TOKEN_BUDGET, fresh=False):
+    """
+    Streaming variant of generate_post: yields the post text piece by piece as the LLM writes it.
+
+    Tanglish spelling correction is applied incrementally to the stream, and the finished
+    post is stored in the generation cache like generate_post does. Errors are yielded as text.
+    """
+    error = validate_inputs(topic, profession, post_reason)
+    if error:
+        yield error
+        return
+
+    with span("generate_post.build_prompt"):
+        prompt, cache_key = prepare_request(post_length, language, topic, profession, post_reason, custom_keywords, few_shot_token_budget)
+
+    cache = get_generation_cache()
+    if cache is not None and not fresh:
+        cached = cache.get(cache_key)
+        record_cache("generate_post", cached is not None)
+        if cached is not None:
+            yield cached
+            return
+
+    parts = []
+    try:
+        chunks = stream_llm(prompt)
+        if language == "Tanglish":
+            chunks = TANGLISH_CORRECTOR.correct_stream(chunks)
+
+        for chunk in chunks:
+            if not parts:
+                chunk = chunk.lstrip()  # Match generate_post, which strips the response
+                if not chunk:
+                    continue
+            parts.append(chunk)
+            yield chunk
+    except Exception as e:
+        yield f"\n\n⚠️ Error generating post: {str(e)}"
+        return
+
+    post = "".join(parts).strip()
+    if not post:
+        yield "⚠️ Error: LLM response was empty. Please try again."
+    elif cache is not None:
+        cache.set(cache_key, post)
+
+def create_post_candidates(post_length, language, topic, profession, post_reason, custom_keywords="", n=DEFAULT_CANDIDATES, few_shot_token_budget=FEW_SHOT_TOKEN_BUDGET):
+    """
+    Writes **n** drafts concurrently and returns them ranked best first (see rank_candidates).
+
+    Groq only accepts one completion per request, so each draft is its own call; the calls
+    run on threads that inherit the caller's context, so a session API key applies to all of
+    them. Each draft is asked for a different angle. Failed drafts are skipped, and the best
+    draft is stored in the generation cache. Raises ValueError for missing inputs, or the
+    first error if no draft succeeded.
+    """
+
+    error = validate_inputs(topic, profession, post_reason)
+    if error:
+        raise ValueError(error)
+
+    with span("generate_post.build_prompt"):
+        prompt, cache_key = prepare_request(post_length, language, topic, profession, post_reason, custom_keywords, few_shot_token_budget)
+    prompts = [prompt] if n <= 1 else [
+        f"{prompt}\n    (Draft {i} of {n}: use a different opening hook and angle than the other drafts.)\n"
+        for i in range(1, n + 1)
+    ]
+
+    with ThreadPoolExecutor(max_workers=len(prompts)) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, invoke_llm, draft_prompt) for draft_prompt in prompts]
+
+    drafts = []
+    errors = []
+    for future in futures:
+        try:
+            response = future.result()
+        except Exception as e:
+            errors.append(e)
+            continue
+        if not response or not isinstance(response, str) or response.strip() == "":
+            continue
+        if language == "Tanglish":
+            with span("generate_post.tanglish_correction"):
+                response = correct_tanglish_spelling(response)
+        drafts.append(response.strip())
+
+    if not drafts:
+        if errors:
+            raise errors[0]
+        raise ValueError("⚠️ Error: LLM response was empty. Please try again.")
+
+    with span("generate_post.rank"):
+        candidates = rank_candidates(drafts, post_length, language, custom_keywords)
+
+    cache = get_generation_cache()
+    if cache is not None:
+        cache.set(cache_key, candidates[0]["text"])
+    return candidates
+
+def rank_candidates(posts, post_length, language, custom_keywords=""):
+    """
+    Orders drafts best first with cheap local checks; returns dicts with the text, score and checks.
+
+    - **length**: 1 when the line count is within get_length_str's range, lower the further off it is
+    - **keywords**: share of the requested keywords the draft mentions (1 when none were requested)
+    - **language**: for Tanglish, the romanized Tamil word share relative to TANGLISH_TARGET_RATIO; for English, 1 unless the draft reads as Tanglish
+    - **overlap**: word-shingle similarity with the drafts ranked above it, subtracted from the score; near-copies (DEDUP_THRESHOLD and up) are dropped
+    """
+
+    low, high = (int(number) for number in re.findall(r"\d+", get_length_str(post_length))[:2])
+    keywords = [keyword for keyword in normalize_keywords(custom_keywords).split(", ") if keyword]
+    detector = get_detector()
+
+    pending = []
+    for text in posts:
+        line_count = count_lines(text)
+        lowered = text.lower()
+        missing = [keyword for keyword in keywords if keyword not in lowered]
+        tamil, total = detector.tamil_ratio(text)
+        tanglish_ratio = tamil / total if total else 0.0
+        if language == "Tanglish":
+            language_score = min(1.0, tanglish_ratio / TANGLISH_TARGET_RATIO)
+        else:
+            language_score = 1.0 if detector.detect(text) == "English" else 0.0
+        checks = {
+            "line_count": line_count,
+            "length": 1 / (1 + max(low - line_count, line_count - high, 0)),
+            "keywords": 1 - len(missing) / len(keywords) if keywords else 1.0,
+            "missing_keywords": missing,
+            "tanglish_ratio": round(tanglish_ratio, 3),
+            "language": language_score,
+        }
+        pending.append((text, checks, shingles(text)))
+
+    # Greedy: the next draft is the one scoring best after its overlap with the drafts already ranked
+    ranked = []
+    while pending:
+        scored = []
+        for candidate in pending:
+            overlap = max((similarity(candidate[2], other[2]) for other in ranked), default=0.0)
+            base = candidate[1]["length"] + candidate[1]["keywords"] + candidate[1]["language"]
+            scored.append((base - overlap, overlap, candidate))
+        score, overlap, best = max(scored, key=lambda item: item[0])
+        pending.remove(best)
+        if overlap >= DEDUP_THRESHOLD:
+            continue
+        best[1]["overlap"] = round(overlap, 3)
+        best[1]["score"] = round(score, 3)
+        ranked.append(best)
+
+    return [{"text": text, "score": checks["score"], "checks": checks} for text, checks, _ in ranked]
+
+def validate_inputs(topic, profession, post_reason):
+    """Returns an error message for a missing required input, or None."""
     if not topic:
         return "⚠️ Error: Topic is missing!"
     if not profession:
         return "⚠️ Error: Profession is missing!"
     if not post_reason:
         return "⚠️ Error: Please specify the purpose of your post."
+    return None
+
+def prepare_request(post_length, language, topic, profession, post_reason, custom_keywords, few_shot_token_budget):
+    """Normalizes the inputs and returns the prompt and its generation cache key.
+
+    The prompt keeps the user's keywords (only whitespace trimmed); the cache key uses their
+    normalized form, so "Python, AI" and "ai, python" share a cache entry.
+    """
+    topic, profession, post_reason = normalize_input(topic), normalize_input(profession), normalize_input(post_reason)
+    keywords, cache_keywords = trim_keywords(custom_keywords), normalize_keywords(custom_keywords)
+    examples = get_few_shot_examples(post_length, language, topic, post_reason, cache_keywords, few_shot_token_budget, profession)
+    prompt = build_prompt(post_length, language, topic, profession, post_reason, keywords, few_shot_token_budget, examples)
+    cache_prompt = build_prompt(post_length, language, topic, profession, post_reason, cache_keywords, few_shot_token_budget, examples)
+    cache_key = make_key(post_length, language, topic, profession, post_reason, cache_keywords, cache_prompt, get_model_name())
+    return prompt, cache_key
+
+def build_prompt(post_length, language, topic, profession, post_reason, custom_keywords="", few_shot_token_budget=FEW_SHOT_TOKEN_BUDGET, examples=None):
+    """Builds the LLM prompt for a LinkedIn post from already validated inputs (few-shot examples are selected unless given)."""
 
     length_str = get_length_str(post_length)
 
@@ -48,6 +399,11 @@ def generate_post(post_length, language, topic, profession, post_reason, custom_
     else:
         language_instructions = "- Use **English only** for professional LinkedIn writing."
 
+    # ✅ **Few-Shot Examples From Real Posts**
+    if examples is None:
+        examples = get_few_shot_examples(post_length, language, topic, post_reason, custom_keywords, few_shot_token_budget, profession)
+    examples_section = format_few_shot_examples(examples)
+
     # ✅ **Dynamically Constructed Prompt Based on User Input**
     prompt = f"""
     You are a professional LinkedIn post writer. Generate a **highly relevant, structured, and engaging LinkedIn post** based on these details:
@@ -64,23 +420,8 @@ def generate_post(post_length, language, topic, profession, post_reason, custom_
     - Avoid generic content. It should be **unique and tailored to the user**.
     
     {language_instructions}
-
+    {examples_section}
     Generate only the LinkedIn post content, no preambles.
     """
 
-    try:
-        # ✅ **Generate post using LLM**
-        response = generate_response(prompt)
-
-        # ✅ **Handle any API failures or empty responses**
-        if not response or not isinstance(response, str) or response.strip() == "":
-            return "⚠️ Error: LLM response was empty. Please try again."
-
-        # ✅ **Apply Tanglish Spelling Correction (if needed)**
-        if language == "Tanglish":
-            response = correct_tanglish_spelling(response)
-
-        return response.strip()
-
-    except Exception as e:
-        return f"⚠️ Error generating post: {str(e)}"
+    return prompt
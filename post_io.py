@@ -0,0 +1,75 @@
+import json
+import os
+
+
+def iter_posts(file_path, chunk_size=1 << 16):
+    """Yields posts one at a time from a JSONL file or a top-level JSON array.
+
+    JSON arrays are decoded incrementally, so neither format is loaded into memory at once.
+    """
+
+    if file_path.endswith(".jsonl"):
+        yield from iter_jsonl(file_path)
+    else:
+        yield from _iter_json_array(file_path, chunk_size)
+
+
+def iter_jsonl(file_path):
+    """Yields one decoded record per non-empty line of a JSONL file."""
+
+    with open(file_path, encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _iter_json_array(file_path, chunk_size):
+    decoder = json.JSONDecoder()
+    with open(file_path, encoding="utf-8") as file:
+        buffer = file.read(chunk_size).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"Expected a JSON array in {file_path}")
+        buffer = buffer[1:]
+        eof = False
+
+        while True:
+            buffer = buffer.lstrip().lstrip(",").lstrip()
+            if buffer.startswith("]"):
+                return
+            try:
+                record, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                # The record is split across chunks; read more and try again
+                if eof:
+                    raise
+                chunk = file.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
+                continue
+            yield record
+            buffer = buffer[end:]
+
+
+def write_jsonl_record(file, record):
+    """Appends one record to an open JSONL file and flushes it so it survives a crash."""
+
+    file.write(json.dumps(record, ensure_ascii=False) + "\n")
+    file.flush()
+
+
+def recover_jsonl(file_path):
+    """Truncates a partially written trailing line and returns the number of complete records."""
+
+    if not os.path.exists(file_path):
+        return 0
+
+    count = 0
+    complete = 0
+    with open(file_path, "rb+") as file:
+        for line in file:
+            if not line.endswith(b"\n"):
+                break
+            count += 1
+            complete += len(line)
+        file.truncate(complete)
+    return count
@@ -0,0 +1,257 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import sys
+import tempfile
+from array import array
+from collections.abc import Sequence
+
+# File layout (native byte order, recorded in the header):
+#   8-byte magic | uint64 header length | JSON header | 8-byte aligned column sections
+# The header holds the interned tag and language strings and each section's
+# (offset past the header, length, typecode). Text and leftover fields live in byte heaps addressed by
+# offset columns, tags are integer IDs, and the (tag, language, length) and
+# (language, length) indexes are stored precomputed so loading only maps the file.
+MAGIC = b"APCOL\x00\x01\x00"
+LENGTHS = ("Short", "Medium", "Long")
+COLUMN_FIELDS = ("text", "line_count", "language", "tags", "engagement")
+
+
+def categorize_length(line_count):
+    """Buckets a post's line count into Short, Medium or Long."""
+
+    if line_count < 5:
+        return "Short"
+    elif 5 <= line_count <= 10:
+        return "Medium"
+    else:
+        return "Long"
+
+
+def fingerprint_row(post):
+    """Encodes the fields a post's search results depend on (text, tags, language, line count)."""
+
+    # Control characters as separators: several times faster than json.dumps on large corpora
+    tags = "\x1e".join(dict.fromkeys(post.get("tags", [])))
+    return f"{post['text']}\x1f{tags}\x1f{post['language']}\x1f{post['line_count']}\n".encode("utf-8")
+
+
+def posts_fingerprint(posts):
+    """Hashes a sequence of processed posts in order, so derived files (e.g. the vector index) can tell they are stale."""
+
+    digest = hashlib.sha256()
+    for post in posts:
+        digest.update(fingerprint_row(post))
+    return digest.hexdigest()
+
+
+def write_columnar(posts, file_path):
+    """Writes processed posts to the columnar format and returns the number of posts written.
+
+    `posts` may be any iterable (e.g. post_io.iter_posts), so a large corpus is never held in
+    memory: text goes straight to a temporary heap file and only the integer columns stay in RAM.
+    """
+
+    interned = {"tags": {}, "languages": {}}
+
+    def intern(kind, value):
+        return interned[kind].setdefault(value, len(interned[kind]))
+
+    columns = {
+        "line_count": array("I"), "engagement": array("q"), "language": array("H"),
+        "tag_offsets": array("Q", [0]), "tag_ids": array("I"),
+        "text_offsets": array("Q", [0]), "extra_offsets": array("Q", [0]),
+    }
+    groups = {}
+    styles = {}
+    fingerprint = hashlib.sha256()  # posts_fingerprint, computed in the same pass
+
+    directory = os.path.dirname(os.path.abspath(file_path))
+    with tempfile.TemporaryFile(dir=directory) as text_heap, tempfile.TemporaryFile(dir=directory) as extra_heap:
+        text_size = extra_size = 0
+        for row, post in enumerate(posts):
+            fingerprint.update(fingerprint_row(post))
+            text = post["text"].encode("utf-8")
+            text_heap.write(text)
+            text_size += len(text)
+            columns["text_offsets"].append(text_size)
+
+            extra = {key: value for key, value in post.items() if key not in COLUMN_FIELDS}
+            if extra:
+                encoded = json.dumps(extra, ensure_ascii=False).encode("utf-8")
+                extra_heap.write(encoded)
+                extra_size += len(encoded)
+            columns["extra_offsets"].append(extra_size)
+
+            language = intern("languages", post["language"])
+            length = LENGTHS.index(categorize_length(post["line_count"]))
+            columns["line_count"].append(post["line_count"])
+            columns["engagement"].append(int(post.get("engagement", 0)))
+            columns["language"].append(language)
+
+            tag_ids = list(dict.fromkeys(intern("tags", tag) for tag in post["tags"]))
+            columns["tag_ids"].extend(tag_ids)
+            columns["tag_offsets"].append(len(columns["tag_ids"]))
+
+            styles.setdefault((language, length), array("I")).append(row)
+            for tag_id in tag_ids:
+                groups.setdefault((tag_id, language, length), array("I")).append(row)
+
+        # Index rows best engagement first (stable, so ties keep file order)
+        engagement = columns["engagement"]
+        for name, index in (("group", groups), ("style", styles)):
+            keys, offsets, rows = array("I"), array("Q", [0]), array("I")
+            for key in sorted(index):
+                keys.extend(key)
+                rows.extend(sorted(index[key], key=lambda row: -engagement[row]))
+                offsets.append(len(rows))
+            columns[f"{name}_keys"], columns[f"{name}_offsets"], columns[f"{name}_rows"] = keys, offsets, rows
+
+        tmp_path = file_path + ".tmp"
+        with open(tmp_path, "wb") as out:
+            _write_sections(out, columns, [("text", text_heap, text_size), ("extra", extra_heap, extra_size)], {
+                "count": len(columns["line_count"]),
+                "fingerprint": fingerprint.hexdigest(),
+                "byteorder": sys.byteorder,
+                "tags": list(interned["tags"]),
+                "languages": list(interned["languages"]),
+            })
+        os.replace(tmp_path, file_path)
+
+    return len(columns["line_count"])
+
+
+def _write_sections(out, columns, heaps, header):
+    # Offsets are relative to the aligned end of the header, so they do not depend on its size
+    sections = {}
+    position = 0
+    for name, column in columns.items():
+        sections[name] = (position, len(column) * column.itemsize, column.typecode)
+        position = _align(position + sections[name][1])
+    for name, _, size in heaps:
+        sections[name] = (position, size, "B")
+        position = _align(position + size)
+    header["sections"] = sections
+
+    encoded = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    out.write(MAGIC)
+    out.write(len(encoded).to_bytes(8, "little"))
+    out.write(encoded)
+    data_start = _align(out.tell())
+
+    for name, column in columns.items():
+        out.seek(data_start + sections[name][0])
+        column.tofile(out)
+    for name, heap, _ in heaps:
+        out.seek(data_start + sections[name][0])
+        heap.seek(0)
+        while chunk := heap.read(1 << 20):
+            out.write(chunk)
+    out.truncate(data_start + position)
+
+
+def _align(position, boundary=8):
+    return (position + boundary - 1) // boundary * boundary
+
+
+class ColumnarPosts:
+    """Read-only, memory-mapped view of a file written by write_columnar.
+
+    Opening the file only parses the header; columns are memoryviews over the mapping, so
+    text and tags are read from disk (and count towards RSS) only when a record is accessed.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._file = open(file_path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"Not a columnar posts file: {file_path}")
+
+        header_end = len(MAGIC) + 8 + int.from_bytes(self._mmap[len(MAGIC):len(MAGIC) + 8], "little")
+        header = json.loads(self._mmap[len(MAGIC) + 8:header_end])
+        data_start = _align(header_end)
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError(f"{file_path} was written on a {header['byteorder']}-endian machine")
+
+        self.count = header["count"]
+        self.fingerprint = header.get("fingerprint")  # Missing in files written before it was recorded
+        self.tags = header["tags"]
+        self.languages = header["languages"]
+        view = memoryview(self._mmap)
+        self.columns = {
+            name: view[data_start + offset:data_start + offset + length].cast(typecode)
+            for name, (offset, length, typecode) in header["sections"].items()
+        }
+
+    def __len__(self):
+        return self.count
+
+    def text(self, row):
+        offsets = self.columns["text_offsets"]
+        return bytes(self.columns["text"][offsets[row]:offsets[row + 1]]).decode("utf-8")
+
+    def tag_names(self, row):
+        offsets = self.columns["tag_offsets"]
+        return [self.tags[tag_id] for tag_id in self.columns["tag_ids"][offsets[row]:offsets[row + 1]]]
+
+    def record(self, row):
+        """Materialises one post as the same dict that was written (plus its length bucket)."""
+
+        columns = self.columns
+        record = {
+            "text": self.text(row),
+            "engagement": columns["engagement"][row],
+            "line_count": columns["line_count"][row],
+            "language": self.languages[columns["language"][row]],
+            "tags": self.tag_names(row),
+        }
+        offsets = columns["extra_offsets"]
+        if offsets[row + 1] > offsets[row]:
+            record.update(json.loads(bytes(columns["extra"][offsets[row]:offsets[row + 1]])))
+        record["length"] = categorize_length(record["line_count"])
+        return record
+
+    def index(self, name):
+        """Returns the stored `name` ("group" or "style") index as {key strings: PostRows}, best engagement first."""
+
+        keys, offsets, rows = (self.columns[f"{name}_{part}"] for part in ("keys", "offsets", "rows"))
+        width = 3 if name == "group" else 2
+        index = {}
+        for i in range(len(offsets) - 1):
+            key = keys[i * width:(i + 1) * width]
+            if name == "group":
+                key = (self.tags[key[0]], self.languages[key[1]], LENGTHS[key[2]])
+            else:
+                key = (self.languages[key[0]], LENGTHS[key[1]])
+            index[key] = PostRows(self, rows[offsets[i]:offsets[i + 1]])
+        return index
+
+class PostRows(Sequence):
+    """Lazy sequence of posts backed by a ColumnarPosts; records are built only when accessed."""
+
+    def __init__(self, store, rows):
+        self.store = store
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return PostRows(self.store, self.rows[item])
+        return self.store.record(self.rows[item])
+
+
+if __name__ == "__main__":
+    from post_io import iter_posts
+
+    parser = argparse.ArgumentParser(description="Convert processed posts (JSON array or JSONL) to the columnar format.")
+    parser.add_argument("input", nargs="?", default="data/processed_posts.json", help="Processed posts file")
+    parser.add_argument("output", nargs="?", default="data/processed_posts.apcol", help="Columnar output file")
+    args = parser.parse_args()
+
+    count = write_columnar(iter_posts(args.input), args.output)
+    print(f"Wrote {count} posts to {args.output}")
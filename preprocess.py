@@ -1,80 +1,655 @@
+import argparse
 import json
 import os
-import time
-import random
-from llm_helper import llm
-from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from llm_helper import get_llm, get_model_name, limited_call, COMPLETION_TOKEN_ALLOWANCE, estimate_tokens, usage_tokens
+from cache import SQLiteCache, make_key
+from tanglish import TanglishCorrector
+from language_detect import local_metadata
+from dedup import DEDUP_THRESHOLD, find_near_duplicates
+from dead_letter import DeadLetterFile, DEAD_LETTER_FILE, read_dead_letters
+import json_repair
+from post_io import iter_posts, iter_jsonl, write_jsonl_record, recover_jsonl
+from metrics import REGISTRY, span, llm_call, record_cache, record_json_repairs
+from tag_unifier import TagRegistry, TAG_REGISTRY_FILE, normalize_tag, unify
+from post_store import write_columnar
+from vector_index import VectorIndex, vector_index_path
 from langchain_core.exceptions import OutputParserException
 
+# Compiled once at import; the phrase dictionary lives in data/tanglish_corrections.json
+TANGLISH_CORRECTOR = TanglishCorrector.from_file()
 
-def process_posts(raw_file_path, processed_file_path=None):
-    """Processes LinkedIn posts by extracting metadata, unifying tags, and correcting Tanglish spelling."""
+
+def process_posts(raw_file_path, processed_file_path=None, max_workers=1, cache_path=None, incremental=False,
+                  batch_token_budget=None, tag_registry_path=None, columnar_path=None, index_path=None,
+                  dedup_threshold=None, dead_letter_path=None):
+    """Processes LinkedIn posts by extracting metadata, unifying tags, and correcting Tanglish spelling.
+
+    With max_workers > 1, metadata extraction runs concurrently on a bounded thread pool.
+    Posts keep their raw file order, so the output matches the sequential run.
+
+    With cache_path set, extracted metadata is stored in a SQLite cache keyed by post text,
+    prompt template and model, so unchanged posts skip the LLM on the next run.
+
+    With incremental=True and an existing processed file, only new or changed raw posts are
+    enriched; their tags are mapped onto the existing unified vocabulary (see merge_incremental).
+
+    With batch_token_budget set, several posts are packed into each extraction request
+    (see extract_metadata_batch), cutting the number of LLM calls.
+
+    With tag_registry_path set, canonical tags are kept in that file across runs (see unify_tags).
+
+    With columnar_path set, the posts are also written in the memory-mappable columnar format
+    (see post_store), which FewShotPosts loads without parsing JSON.
+
+    With index_path set, every post is embedded once and saved to a vector index there (see
+    vector_index) for semantic few-shot retrieval.
+
+    With dedup_threshold set, near-duplicate posts are grouped first and only one post per
+    group is sent to the LLM (see enrich_deduplicated).
+
+    With dead_letter_path set, a post whose enrichment fails is written to that JSONL file and
+    left out of the output instead of aborting the run (see replay_dead_letters).
+    """
 
     # Check if raw file exists
     if not os.path.exists(raw_file_path):
         raise FileNotFoundError(f"File not found: {raw_file_path}")
 
-    with open(raw_file_path, encoding="utf-8") as file:
-        posts = json.load(file)
-        enriched_posts = []
+    with span("process_posts.load"):
+        with open(raw_file_path, encoding="utf-8") as file:
+            posts = json.load(file)
+
+    cache = None
+    if cache_path:
+        cache = SQLiteCache(cache_path, namespace="metadata")
+        cache.invalidate(metadata_cache_version())  # Drop entries built from an older template
+
+    registry = TagRegistry(tag_registry_path)
+    dead_letters = DeadLetterFile(dead_letter_path) if dead_letter_path else None
+    enrich = partial(enrich_posts, cache=cache, max_workers=max_workers, batch_token_budget=batch_token_budget,
+                     dead_letters=dead_letters)
+    if dedup_threshold:
+        enrich = partial(enrich_deduplicated, enrich=enrich, threshold=dedup_threshold)
+    if incremental and os.path.exists(processed_file_path):
+        existing_posts = list(iter_posts(processed_file_path))
+        with span("process_posts.merge_incremental"):
+            enriched_posts = merge_incremental(posts, existing_posts, enrich, registry)
+    else:
+        with span("process_posts.enrich"):
+            enriched_posts = [post for post in enrich(posts) if post is not None]
+
+        # Get unified tags mapping
+        with span("process_posts.unify_tags"):
+            unified_tags = get_unified_tags(enriched_posts, registry)
+
+        # Replace tags in posts using unified mapping
+        with span("process_posts.apply_tags"):
+            apply_tag_mapping(enriched_posts, unified_tags)
+
+    if cache:
+        stats = cache.stats()
+        print(f"Metadata cache: {stats['hits']} hits, {stats['misses']} misses")
+        cache.close()
+
+    report_dead_letters(dead_letters)
+    registry.save()
+
+    # Save processed posts (JSONL when the output is named .jsonl, as FewShotPosts reads it line by line)
+    with span("process_posts.save"):
+        with open(processed_file_path, mode="w", encoding="utf-8") as outfile:
+            if processed_file_path.endswith(".jsonl"):
+                for post in enriched_posts:
+                    write_jsonl_record(outfile, post)
+            else:
+                json.dump(enriched_posts, outfile, indent=4)
+        if columnar_path:
+            write_columnar(enriched_posts, columnar_path)
+
+    if index_path:
+        with span("process_posts.embed"):
+            VectorIndex.build(enriched_posts).save(index_path)
+
+
+def process_posts_stream(raw_file_path, processed_file_path, max_workers=1, cache_path=None, batch_token_budget=None,
+                         tag_registry_path=None, columnar_path=None, index_path=None, dead_letter_path=None):
+    """Streaming variant of process_posts that writes JSONL with roughly constant memory.
+
+    Pass 1 reads raw posts lazily (JSON array or JSONL) and appends each enriched post to
+    `<processed_file_path>.partial` as soon as it is ready. Pass 2 collects the tag set,
+    unifies it and rewrites the partial file into the final JSONL output. If a run is
+    interrupted, the next run resumes after the last complete record in the partial file.
+
+    With dead_letter_path set, failed posts go to that file as in process_posts; the partial
+    file keeps a placeholder for them so resuming stays aligned with the raw posts.
+    """
+
+    if not os.path.exists(raw_file_path):
+        raise FileNotFoundError(f"File not found: {raw_file_path}")
 
+    partial_path = processed_file_path + ".partial"
+    done = recover_jsonl(partial_path)
+
+    raw_posts = iter_posts(raw_file_path)
+    if done:
+        # Make sure the partial output was produced from the same raw posts before resuming
+        for written, raw_post in zip(iter_jsonl(partial_path), raw_posts):
+            if written.get("source_hash") != source_hash(raw_post):
+                print("⚠️ Warning: partial output does not match the raw file. Starting over.")
+                os.remove(partial_path)
+                done = 0
+                raw_posts = iter_posts(raw_file_path)
+                break
+        else:
+            print(f"Resuming after {done} already processed posts")
+
+    cache = None
+    if cache_path:
+        cache = SQLiteCache(cache_path, namespace="metadata")
+        cache.invalidate(metadata_cache_version())
+
+    dead_letters = DeadLetterFile(dead_letter_path, resume=bool(done)) if dead_letter_path else None
+    hashes = deque()
+
+    def remember_hashes(posts):
         for post in posts:
-            metadata = extract_metadata(post["text"])
-            post_with_metadata = {**post, **metadata}  # Correct syntax for dictionary merging
-            
-            # Apply Tanglish correction if the post is identified as Tanglish
-            if post_with_metadata["language"].lower() == "tanglish":
-                post_with_metadata["text"] = correct_tanglish_spelling(post_with_metadata["text"])
+            hashes.append(source_hash(post))
+            yield post
+
+    # Pass 1: enrich and append each post as soon as it is ready (enrich_posts keeps input order)
+    with span("process_posts.enrich"), open(partial_path, mode="a", encoding="utf-8") as outfile:
+        for post in enrich_posts(remember_hashes(raw_posts), cache, max_workers, batch_token_budget, dead_letters):
+            post_hash = hashes.popleft()
+            write_jsonl_record(outfile, post if post is not None else {"source_hash": post_hash, "dead_letter": True})
+
+    if cache:
+        stats = cache.stats()
+        print(f"Metadata cache: {stats['hits']} hits, {stats['misses']} misses")
+        cache.close()
+
+    report_dead_letters(dead_letters)
+
+    # Pass 2: unify tags, then rewrite the partial file with the unified tags
+    with span("process_posts.unify_tags"):
+        unique_tags = set()
+        for post in iter_jsonl(partial_path):
+            unique_tags.update(post.get("tags", []))
+        registry = TagRegistry(tag_registry_path)
+        unified_tags = unify_tags(unique_tags, registry=registry)
+        registry.save()
+
+    tmp_path = processed_file_path + ".tmp"
+    with span("process_posts.apply_tags"), open(tmp_path, mode="w", encoding="utf-8") as outfile:
+        for post in iter_jsonl(partial_path):
+            if post.get("dead_letter"):
+                continue
+            apply_tag_mapping([post], unified_tags)
+            outfile.write(json.dumps(post, ensure_ascii=False) + "\n")
+
+    os.replace(tmp_path, processed_file_path)
+    os.remove(partial_path)
+
+    if columnar_path:
+        with span("process_posts.save"):
+            write_columnar(iter_jsonl(processed_file_path), columnar_path)
+
+    if index_path:
+        with span("process_posts.embed"):
+            VectorIndex.build(iter_jsonl(processed_file_path)).save(index_path)
+
+
+def replay_dead_letters(dead_letter_path, processed_file_path, max_workers=1, cache_path=None, batch_token_budget=None,
+                        tag_registry_path=None, columnar_path=None, index_path=None):
+    """Re-processes only the posts in a dead-letter file and adds the recovered ones to the processed output.
+
+    Recovered posts are appended to the output (JSON array or JSONL) and their tags mapped onto
+    its vocabulary as in incremental runs, stamped with the dead_letter_hash of their raw
+    record. Letters matching a stamped post are counted as already recovered (an earlier replay
+    stopped before rewriting the file); identical letters are matched one stamped post each.
+    Posts that fail again replace the dead-letter file, so replaying can be repeated until it
+    is gone. The file is left alone while any letter is unaccounted for.
+    """
+
+    letters = read_dead_letters(dead_letter_path)
+    if not letters:
+        print(f"No dead letters in {dead_letter_path}")
+        return
+
+    existing_posts = list(iter_posts(processed_file_path)) if os.path.exists(processed_file_path) else []
+    replayed = Counter(post["dead_letter_hash"] for post in existing_posts if "dead_letter_hash" in post)
+    raw_posts = []
+    skipped = 0
+    for letter in letters:
+        letter_hash = dead_letter_hash(letter["post"])
+        if replayed[letter_hash]:
+            replayed[letter_hash] -= 1
+            skipped += 1
+        else:
+            raw_posts.append(letter["post"])
+
+    cache = None
+    if cache_path:
+        cache = SQLiteCache(cache_path, namespace="metadata")
+        cache.invalidate(metadata_cache_version())
+
+    # Failures go to a new file first, so an interrupted replay keeps the original dead letters
+    dead_letters = DeadLetterFile(dead_letter_path + ".tmp")
+    recovered = []
+    with span("process_posts.enrich"):
+        enriched = enrich_posts(raw_posts, cache, max_workers, batch_token_budget, dead_letters)
+        for raw_post, post in zip(raw_posts, enriched):
+            if post is not None:
+                post["dead_letter_hash"] = dead_letter_hash(raw_post)
+                recovered.append(post)
+    dead_letters.close()
+    if cache:
+        cache.close()
+
+    registry = TagRegistry(tag_registry_path)
+    with span("process_posts.unify_tags"):
+        map_onto_vocabulary(recovered, existing_posts, registry)
+    registry.save()
+
+    with span("process_posts.save"):
+        if processed_file_path.endswith(".jsonl"):
+            with open(processed_file_path, mode="a", encoding="utf-8") as outfile:
+                for post in recovered:
+                    write_jsonl_record(outfile, post)
+        else:
+            with open(processed_file_path, mode="w", encoding="utf-8") as outfile:
+                json.dump(existing_posts + recovered, outfile, indent=4)
+        if columnar_path:
+            write_columnar(iter_posts(processed_file_path), columnar_path)
+
+    if index_path:
+        with span("process_posts.embed"):
+            VectorIndex.build(iter_posts(processed_file_path)).save(index_path)
+
+    print(f"Replayed {len(letters)} dead letters: {len(recovered)} recovered, {dead_letters.count} failed again, "
+          f"{skipped} skipped as already recovered")
+    if len(recovered) + dead_letters.count + skipped != len(letters):
+        print(f"⚠️ Warning: not every dead letter is accounted for, keeping {dead_letter_path}")
+        if os.path.exists(dead_letters.path):
+            os.remove(dead_letters.path)
+    elif dead_letters.count:
+        os.replace(dead_letters.path, dead_letter_path)
+    else:
+        os.remove(dead_letter_path)
+
+
+def dead_letter_hash(raw_post):
+    """Fingerprints a whole raw record, so reposts of the same text with other fields stay distinct."""
+
+    return make_key(json.dumps(raw_post, sort_keys=True, ensure_ascii=False))
+
+
+def enrich_posts(posts, cache=None, max_workers=1, batch_token_budget=None, dead_letters=None):
+    """Yields enriched posts in input order, one request per post or packed into token-budgeted batches.
+
+    With dead_letters (a DeadLetterFile) set, a post whose enrichment fails is recorded there
+    and yields None, so one bad post does not abort the run; otherwise the error propagates.
+    """
+
+    isolate = dead_letters is not None
+    if not batch_token_budget:
+        results = ordered_map(partial(enrich_post_isolated if isolate else enrich_post, cache=cache), posts, max_workers)
+    else:
+        batches = pack_batches(posts, batch_token_budget)
+        enrich = partial(enrich_batch_isolated if isolate else enrich_batch, cache=cache)
+        results = (post for enriched_batch in ordered_map(enrich, batches, max_workers) for post in enriched_batch)
+
+    for result in results:
+        if isinstance(result, FailedPost):
+            dead_letters.add(result.post, result.error)
+            REGISTRY.inc("autopost_dead_letters_total")
+            result = None
+        yield result
+
+
+class FailedPost:
+    """Result of an isolated enrichment that raised; enrich_posts turns it into a dead letter."""
+
+    def __init__(self, post, error):
+        self.post = post
+        self.error = error
+
+
+def enrich_post_isolated(post, cache=None):
+    """Like enrich_post, but returns a FailedPost instead of raising."""
+
+    try:
+        return enrich_post(post, cache=cache)
+    except Exception as e:
+        return FailedPost(post, e)
+
+
+def enrich_batch_isolated(posts, cache=None):
+    """Like enrich_batch, but if the batch fails its posts are retried one by one so only bad posts fail."""
+
+    try:
+        return enrich_batch(posts, cache=cache)
+    except Exception:
+        return [enrich_post_isolated(post, cache=cache) for post in posts]
+
+
+def report_dead_letters(dead_letters):
+    if dead_letters is None:
+        return
+    dead_letters.close()
+    if dead_letters.count:
+        print(f"⚠️ Warning: {dead_letters.count} posts failed and were written to {dead_letters.path}. "
+              f"Re-process them with --replay-dead-letters.")
+
+
+def enrich_post(post, cache=None):
+    """Extracts metadata for a single raw post and applies Tanglish and profession enhancements."""
+
+    return finish_post(post, extract_metadata(post["text"], cache=cache))
+
+
+def enrich_batch(posts, cache=None):
+    """Enriches a list of raw posts with a single batched metadata request."""
+
+    metadata_list = extract_metadata_batch([post["text"] for post in posts], cache=cache)
+    return [finish_post(post, metadata) for post, metadata in zip(posts, metadata_list)]
+
+
+def pack_batches(posts, token_budget, max_batch_size=50):
+    """Groups posts into lists whose estimated prompt and output tokens fit the token budget."""
+
+    budget = token_budget - estimate_tokens(BATCH_METADATA_TEMPLATE)
+    batch = []
+    used = 0
+    for post in posts:
+        cost = estimate_tokens(post["text"]) + BATCH_TOKENS_PER_POST
+        if batch and (used + cost > budget or len(batch) >= max_batch_size):
+            yield batch
+            batch = []
+            used = 0
+        batch.append(post)
+        used += cost
+    if batch:
+        yield batch
+
+
+def enrich_deduplicated(posts, enrich, threshold=DEDUP_THRESHOLD):
+    """Enriches one representative per group of near-duplicate posts and copies its metadata to the rest.
+
+    Groups come from MinHash/LSH over word shingles (see dedup). `enrich` is called with the
+    representatives only; the other posts take their representative's profession and tags,
+    while line count and language are still computed from their own text. Returns the
+    enriched posts in input order.
+    """
 
-            # Enhance post with profession-based content
-            profession = post_with_metadata.get("profession", "General")
-            post_with_metadata["text"] = enhance_post_with_profession(post_with_metadata["text"], profession)
+    posts = list(posts)
+    with span("process_posts.dedup"):
+        representatives = find_near_duplicates([post["text"] for post in posts], threshold)
+    unique = sorted(set(representatives))
+    enriched = dict(zip(unique, enrich([posts[i] for i in unique])))
 
-            enriched_posts.append(post_with_metadata)
+    # Posts whose representative failed are enriched on their own
+    failed = {i for i in unique if enriched[i] is None}
+    if failed:
+        orphans = [i for i, representative in enumerate(representatives) if representative in failed and representative != i]
+        enriched.update(zip(orphans, enrich([posts[i] for i in orphans])))
+        for i in orphans:
+            representatives[i] = i
 
-    # Get unified tags mapping
-    unified_tags = get_unified_tags(enriched_posts)
+    saved = len(posts) - len(enriched)
+    REGISTRY.inc("autopost_dedup_skipped_posts_total", value=saved)
+    print(f"Near-duplicates: {saved} of {len(posts)} posts reuse another post's metadata, saving {saved} metadata extractions")
 
-    # Replace tags in posts using unified mapping
-    for post in enriched_posts:
+    return [
+        enriched[i] if representative == i else copy_metadata(post, posts[representative], enriched[representative])
+        for i, (post, representative) in enumerate(zip(posts, representatives))
+    ]
+
+
+def copy_metadata(post, representative, enriched_representative):
+    """Enriches a near-duplicate post with the LLM metadata (profession, tags) of its representative."""
+
+    metadata = {
+        key: value for key, value in enriched_representative.items()
+        if key not in representative and key != "source_hash"
+    }
+    return finish_post(post, {**metadata, **local_metadata(post["text"])})
+
+
+def finish_post(post, metadata):
+    """Merges extracted metadata into a raw post and applies Tanglish and profession enhancements."""
+
+    post_with_metadata = {**post, **metadata}  # Correct syntax for dictionary merging
+    post_with_metadata["source_hash"] = source_hash(post)  # Lets incremental runs detect changes
+
+    # Apply Tanglish correction if the post is identified as Tanglish
+    if post_with_metadata["language"].lower() == "tanglish":
+        post_with_metadata["text"] = correct_tanglish_spelling(post_with_metadata["text"])
+
+    # Enhance post with profession-based content
+    profession = post_with_metadata.get("profession", "General")
+    post_with_metadata["text"] = enhance_post_with_profession(post_with_metadata["text"], profession)
+
+    return post_with_metadata
+
+
+def source_hash(raw_post):
+    """Hashes the raw post text; the processed text is rewritten, so it cannot be compared directly."""
+
+    return make_key(raw_post["text"])
+
+
+def merge_incremental(raw_posts, existing_posts, enrich, registry=None):
+    """Merges raw posts into a previous processed output, enriching only new or changed posts.
+
+    `enrich` takes a list of raw posts and yields them enriched, in order (see enrich_posts).
+    Unchanged posts keep their processed text and tags (other raw fields such as engagement
+    are refreshed). Posts missing from the raw file are dropped. Tags of newly enriched posts
+    are matched against the existing vocabulary first; only unseen tags go to the LLM.
+    """
+
+    existing_by_hash = {post["source_hash"]: post for post in existing_posts if "source_hash" in post}
+
+    merged = []
+    new_positions = []
+    new_raw = []
+    for raw_post in raw_posts:
+        existing = existing_by_hash.get(source_hash(raw_post))
+        if existing is None:
+            new_positions.append(len(merged))
+            new_raw.append(raw_post)
+            merged.append(None)
+        else:
+            refreshed = {key: value for key, value in raw_post.items() if key != "text"}
+            merged.append({**existing, **refreshed})
+
+    print(f"Incremental run: {len(new_raw)} new or changed posts, {len(raw_posts) - len(new_raw)} unchanged")
+    if not new_raw:
+        return merged
+
+    new_posts = list(enrich(new_raw))
+    for position, post in zip(new_positions, new_posts):
+        merged[position] = post
+
+    new_posts = [post for post in new_posts if post is not None]  # Failed posts (see enrich_posts) are left out
+    map_onto_vocabulary(new_posts, existing_posts, registry)
+    return [post for post in merged if post is not None]
+
+
+def map_onto_vocabulary(new_posts, existing_posts, registry=None):
+    """Rewrites the tags of new posts onto the tag vocabulary of existing posts; only unseen tags go to the LLM."""
+
+    vocabulary = {tag for post in existing_posts for tag in post.get("tags", [])}
+    known = {normalize_tag(tag): tag for tag in vocabulary}
+    mapping = {}
+    unseen = set()
+    for post in new_posts:
+        for tag in post["tags"]:
+            if normalize_tag(tag) in known:
+                mapping[tag] = known[normalize_tag(tag)]
+            else:
+                unseen.add(tag)
+
+    if unseen:
+        mapping.update(unify_tags(unseen, vocabulary, registry))
+
+    apply_tag_mapping(new_posts, mapping)
+
+
+def apply_tag_mapping(posts, mapping):
+    """Rewrites each post's tags in place using a tag -> unified tag mapping."""
+
+    for post in posts:
         current_tags = post["tags"]
-        new_tags = {unified_tags.get(tag, tag) for tag in current_tags}  
+        new_tags = {mapping.get(tag, tag) for tag in current_tags}  
         post["tags"] = list(new_tags)
 
-    # Save processed posts
-    with open(processed_file_path, mode="w", encoding="utf-8") as outfile:
-        json.dump(enriched_posts, outfile, indent=4)
 
+def ordered_map(func, items, max_workers=1):
+    """Yields func(item) for every item in input order, with at most max_workers calls running at once."""
 
-def extract_metadata(post):
-    """Extracts metadata (line count, language, profession, and tags) from a LinkedIn post using LLM."""
-    
-    template = '''
+    if max_workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    # Keep a bounded window of futures so lazy inputs are never fully materialised
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= max_workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+METADATA_TEMPLATE = '''
     You are given a LinkedIn post. Extract:
-    1. Number of lines.
-    2. Language (English or Tanglish).
-    3. Relevant profession (if applicable) from: Student, IAS Officer, Lawyer, Cloud Engineer, AI Engineer, Fresher, Data Scientist, Entrepreneur, Doctor, Marketer, etc.
-    4. Extract 2-3 relevant tags.
+    1. Relevant profession (if applicable) from: Student, IAS Officer, Lawyer, Cloud Engineer, AI Engineer, Fresher, Data Scientist, Entrepreneur, Doctor, Marketer, etc.
+    2. Extract 2-3 relevant tags.
 
-    Output in JSON format with fields: line_count, language, profession, tags.
+    Output in JSON format with fields: profession, tags.
     
     Here is the actual post:
     {post}
     '''
 
-    pt = PromptTemplate.from_template(template)
-    chain = pt | llm
 
-    response = retry_invoke(chain, {"post": post})  
+BATCH_METADATA_TEMPLATE = '''
+    You are given several LinkedIn posts. Each post starts with a line "### Post <id>". For every post extract:
+    1. Relevant profession (if applicable) from: Student, IAS Officer, Lawyer, Cloud Engineer, AI Engineer, Fresher, Data Scientist, Entrepreneur, Doctor, Marketer, etc.
+    2. Extract 2-3 relevant tags.
+
+    Output only a JSON array with one object per post, in the same order, with fields: id, profession, tags.
+
+    Here are the posts:
+    {posts}
+    '''
+
+# Rough allowance for the id header and the JSON object each batched post adds (also its expected reply)
+BATCH_TOKENS_PER_POST = 40
+
+# Expected reply lengths reserved against the tokens-per-minute quota (settled with actual usage)
+METADATA_COMPLETION_TOKENS = 60
+TAG_NAME_COMPLETION_TOKENS = 15  # Per cluster
+
+
+def metadata_cache_version():
+    """Identifies the current extraction prompts; cache entries from other versions are stale.
+
+    The model name is part of every entry's key instead, so runs against another backend (e.g.
+    the offline stub) neither see nor invalidate this model's entries.
+    """
+
+    return make_key(METADATA_TEMPLATE, BATCH_METADATA_TEMPLATE)
+
+
+def extract_metadata(post, cache=None):
+    """Extracts metadata (line count, language, profession, and tags) from a LinkedIn post.
+
+    Line count and language are computed locally (see language_detect); only profession and
+    tags come from the LLM.
+    """
+
+    if cache is not None:
+        key = make_key(post, METADATA_TEMPLATE, get_model_name())
+        cached = cache.get(key)
+        record_cache("extract_metadata", cached is not None)
+        if cached is not None:
+            return {**cached, **local_metadata(post)}
+
+    chain = build_chain(METADATA_TEMPLATE)
+
+    response = retry_invoke(chain, {"post": post}, operation="extract_metadata",
+                            completion_tokens=METADATA_COMPLETION_TOKENS)
 
     try:
-        json_parser = JsonOutputParser()
-        res = json_parser.parse(response.content)
-    except OutputParserException:
-        raise OutputParserException("Context too big. Unable to parse post metadata.")
+        res = checked_metadata(parse_json_output(response.content, "extract_metadata"), "extract_metadata")
+    except OutputParserException as e:
+        raise OutputParserException(f"Unable to parse post metadata: {e}")
 
-    return res
+    if cache is not None:
+        cache.set(key, res, version=metadata_cache_version())
+
+    return {**res, **local_metadata(post)}
+
+
+def extract_metadata_batch(posts, cache=None):
+    """Extracts metadata for several posts with one LLM call and returns it in input order.
+
+    As in extract_metadata, line count and language are computed locally. Posts missing from the response, or whose object is malformed, are retried one by one
+    with extract_metadata.
+    """
+
+    results = [None] * len(posts)
+    keys = [make_key(post, BATCH_METADATA_TEMPLATE, get_model_name()) for post in posts]
+
+    pending = []
+    for i, post in enumerate(posts):
+        cached = None
+        if cache is not None:
+            cached = cache.get_first([keys[i], make_key(post, METADATA_TEMPLATE, get_model_name())])
+            record_cache("extract_metadata", cached is not None)
+        if cached is not None:
+            results[i] = {**cached, **local_metadata(post)}
+        else:
+            pending.append(i)
+
+    if len(pending) > 1:
+        posts_block = "\n\n".join(f"### Post {i}\n{posts[i]}" for i in pending)
+        chain = build_chain(BATCH_METADATA_TEMPLATE)
+
+        response = retry_invoke(chain, {"posts": posts_block}, operation="extract_metadata_batch",
+                                completion_tokens=BATCH_TOKENS_PER_POST * len(pending))
+
+        try:
+            parsed = parse_json_output(response.content, "extract_metadata_batch")
+        except OutputParserException:
+            parsed = []
+            print(f"⚠️ Warning: batched metadata could not be parsed. Retrying {len(pending)} posts individually.")
+
+        for item in parsed if isinstance(parsed, list) else []:
+            try:
+                item = checked_metadata(item, "extract_metadata_batch", required=("id", "tags"))
+            except OutputParserException:
+                continue  # Falls back to the single-post path below
+            try:
+                i = int(item.pop("id"))
+            except (TypeError, ValueError):
+                continue
+            if i in pending and results[i] is None:
+                if cache is not None:
+                    cache.set(keys[i], item, version=metadata_cache_version())
+                results[i] = {**item, **local_metadata(posts[i])}
+
+    # Anything the batch did not cover goes through the single-post path
+    for i in pending:
+        if results[i] is None:
+            results[i] = extract_metadata(posts[i], cache=cache)
+
+    return results
 
 
 def enhance_post_with_profession(text, profession):
@@ -96,7 +671,7 @@ def enhance_post_with_profession(text, profession):
     return text
 
 
-def get_unified_tags(posts_with_metadata):
+def get_unified_tags(posts_with_metadata, registry=None):
     """Unifies tags across all posts using an LLM for better categorization and consistency."""
 
     unique_tags = set()
@@ -105,173 +680,183 @@ def get_unified_tags(posts_with_metadata):
     for post in posts_with_metadata:
         unique_tags.update(post["tags"])
 
-    unique_tags_list = ", ".join(sorted(unique_tags))  # Sort to maintain consistency
-
-    # LLM-based unification prompt
-    template = '''  
-    I will give you a list of tags. You need to unify them with the following rules:  
-
-    🔹 **Rules for Tag Unification:**  
-    1️⃣ Merge similar tags into a single standardized category.  
-       - Example:  
-          - "Fresh Graduates", "Recent Graduates" → **"Freshers"**  
-          - "Job Hunting", "Job Search", "Applying for Jobs" → **"Job Search"**  
-          - "Motivation", "Inspiration", "Career Motivation" → **"Motivation"**  
-          - "Mental Health", "Job Search Anxiety", "Stress Management" → **"Mental Health"**  
-          - "Networking", "Building Connections", "Professional Networking" → **"Networking"**  
-          - "Self Improvement", "Personal Growth", "Career Growth" → **"Self Improvement"**  
-          - "Rejections", "Job Rejections", "Application Rejections" → **"Rejections"**  
-    2️⃣ Each tag should follow **Title Case formatting** (e.g., "Job Search" instead of "job search").  
-    3️⃣ Return a **valid JSON object** mapping original tags to unified tags.  
-       Example Output Format:  
-       ```json
-       {{"Fresh Graduates": "Freshers", "Job Hunting": "Job Search", "Motivation": "Motivation"}}
-       ```
-
-    **List of Tags:**  
-    {tags}
-    '''  
-
-    pt = PromptTemplate.from_template(template)
-    chain = pt | llm
-
-    response = retry_invoke(chain, {"tags": unique_tags_list})  # Use retry logic
+    return unify_tags(unique_tags, registry=registry)
+
+
+# Clusters named per request, and naming requests in flight, when unifying tags
+TAG_CLUSTERS_PER_REQUEST = 40
+TAG_NAMING_WORKERS = 4
+
+TAG_CLUSTER_TEMPLATE = '''
+    Each numbered line below is a group of similar LinkedIn post tags. Give every group one standardized category name:
+    1. Use a short, general category (e.g. "Job Hunting" and "Applying for Jobs" → "Job Search", "Fresh Graduates" → "Freshers").
+    2. Use **Title Case formatting** (e.g., "Job Search" instead of "job search").
+    3. Return only a **valid JSON object** mapping each group number to its name, e.g. {{"1": "Job Search", "2": "Freshers"}}
+
+    **Tag Groups:**
+    {groups}
+    '''
 
-    try:
-        json_parser = JsonOutputParser()
-        res = json_parser.parse(response.content)
 
-        # Ensure all keys exist in mapping (fallback to original if missing)
-        for tag in unique_tags:
-            res.setdefault(tag, tag)
+def unify_tags(unique_tags, vocabulary=None, registry=None):
+    """Maps tags onto unified categories and returns a {tag: unified tag} mapping.
 
-        return res
+    Similar tags are clustered locally by character n-grams (see tag_unifier); tags matching
+    the registry, or a cluster holding one of its canonical tags, need no LLM call. Only new
+    clusters are sent to the LLM for a name, in small chunks that run in parallel. `vocabulary`
+    adds existing unified tags to the registry (an in-memory one if none is given).
+    """
 
+    registry = registry if registry is not None else TagRegistry()
+    for tag in vocabulary or ():
+        if registry.lookup(tag) is None:
+            registry.register(tag, tag)
+
+    return unify(unique_tags, registry, name_tag_clusters,
+                 chunk_size=TAG_CLUSTERS_PER_REQUEST, max_workers=TAG_NAMING_WORKERS)
+
+
+def name_tag_clusters(clusters):
+    """Asks the LLM for one unified name per tag cluster; returns the names in order (None where missing)."""
+
+    groups = "\n".join(f"{i}. {' | '.join(cluster)}" for i, cluster in enumerate(clusters, start=1))
+    chain = build_chain(TAG_CLUSTER_TEMPLATE)
+
+    response = retry_invoke(chain, {"groups": groups}, operation="unify_tags",
+                            completion_tokens=TAG_NAME_COMPLETION_TOKENS * len(clusters))
+
+    try:
+        names = parse_json_output(response.content, "unify_tags")
     except OutputParserException:
-        print("⚠️ Warning: LLM output parsing failed. Falling back to default mapping.")
-        return {tag: tag for tag in unique_tags}  # Return original tags as fallback
+        print(f"⚠️ Warning: tag cluster names could not be parsed. Naming {len(clusters)} clusters locally.")
+        return [None] * len(clusters)
 
-def retry_invoke(chain, input_data, max_retries=3):
-    """Retries the LLM call with exponential backoff to handle rate limits."""
-    
-    for attempt in range(max_retries):
-        try:
-            response = chain.invoke(input=input_data)
-            return response
-        except Exception as e:
-            print(f"Attempt {attempt+1} failed: {e}")
-            time.sleep(2 ** attempt + random.uniform(0, 1))  
+    if not isinstance(names, dict):
+        names = {}
+    return [
+        names[str(i)].strip() if isinstance(names.get(str(i)), str) and names[str(i)].strip() else None
+        for i in range(1, len(clusters) + 1)
+    ]
+
+def build_chain(template):
+    """Builds a prompt | llm chain for the current API key."""
+
+    # Imported here so that `import preprocess` does not pay for loading LangChain's prompt stack
+    from langchain_core.prompts import PromptTemplate
+
+    return PromptTemplate.from_template(template) | get_llm()
+
+
+def parse_json_output(text, operation="llm_json"):
+    """Parses JSON from an LLM reply, repairing small defects locally instead of calling the LLM again.
+
+    Code fences, surrounding prose, trailing commas, single quotes and the like are fixed by
+    json_repair and counted per `operation`. Raises OutputParserException if nothing can be recovered.
+    """
+
+    try:
+        value, repairs = json_repair.loads(text)
+    except json_repair.JSONRepairError as e:
+        REGISTRY.inc("autopost_json_parse_failures_total", {"operation": operation})
+        raise OutputParserException(str(e))
+    record_json_repairs(operation, repairs)
+    return value
+
+
+def checked_metadata(record, operation, required=("tags",)):
+    """Validates (and coerces) one extracted metadata object; raises OutputParserException if it does not fit."""
+
+    if isinstance(record, dict):
+        # Line count and language are computed locally (see local_metadata), so the LLM's guesses are ignored
+        record = {key: value for key, value in record.items() if key not in ("line_count", "language")}
+    try:
+        record, repairs = json_repair.validate_metadata(record, required)
+    except json_repair.JSONRepairError as e:
+        REGISTRY.inc("autopost_json_parse_failures_total", {"operation": operation})
+        raise OutputParserException(str(e))
+    record_json_repairs(operation, repairs)
+    return record
+
+
+def retry_invoke(chain, input_data, max_retries=3, operation="llm_chain", completion_tokens=COMPLETION_TOKEN_ALLOWANCE):
+    """Invokes the chain within the shared rate limit, retrying failures and honouring Retry-After.
+
+    `completion_tokens` is the expected reply length (see llm_helper.limited_call). Latency,
+    retries and token usage are recorded under `operation` (see metrics.llm_call).
+    """
 
-    raise Exception("Max retries reached")
+    with llm_call(operation) as call:
+        prompt_tokens = estimate_prompt_tokens(chain, input_data)
+        response, record_usage = limited_call(call, lambda: chain.invoke(input=input_data), prompt_tokens,
+                                              completion_tokens, max_retries)
+        record_usage(*usage_tokens(response, prompt_tokens))
+        return response
+
+
+def estimate_prompt_tokens(chain, input_data):
+    """Estimates the prompt tokens of a prompt | llm chain call."""
+
+    prompt = getattr(chain, "first", None)
+    try:
+        text = prompt.format(**input_data)
+    except Exception:
+        text = json.dumps(input_data)
+    return estimate_tokens(text)
 
 
 def correct_tanglish_spelling(text):
     """Corrects Tanglish spelling and ensures phonetic readability."""
 
-    corrections = {
-        # Common Tamil words with correct transliteration
-        "ungalukku": "ungaluku",
-        "pannuvaanga": "pannuvanga",
-        "support pannuvaanga": "support pannuvanga",
-        "irukku": "iruku",
-        "kastama": "kashtama",
-        "thevai": "thevai",
-        "nalla": "nalla",
-        "venum": "venum",
-        "resume nalla irukkanum": "resume nallaa irukanom",
-        "job search vera level stress": "job search periya stress",
-        "try pannu da": "try pannunga daa",
-        "bro, stress aayiduchu": "bro, stress aagudhu",
-        "sama kashtama": "romba kashtama",
-        "parava illa da": "parava illa daa",
-        "santhosha news bro": "super news bro",
-        "correct ah decide pannu da": "correct ah decide pannunga daa",
-        "kandippa next level povom": "kandippa next level povom bro",
-        "romba naala free time illa": "romba naala free time illa bro",
-        "veliya poitu varen": "veliya poitu varen",
-        "podhum da": "podhum daa",
-        "kashtam but manage pannu": "kashtamaana situation dhan but manage pannunga",
-        "intha decision confirm ah best": "intha decision confirm ah nalla decision bro",
-        "modhal la kashtama dhan irukum": "modhala kashtama dhan irukum",
-        "positive mindset vachuko": "positive mindset vachikonga",
-        "thirumba start pannalama": "thirumba start pannalama bro",
-        "correct ah decide pannu da": "correct ah decide pannunga daa",
-        "chumma light ah eduthu": "chumma light ah eduthuko",
-        
-        # Job-related corrections
-        "apply pannuvinga": "apply pannunga",
-        "call varuma": "call varuma?",
-        "mail varuma": "mail varuma?",
-        "kandippa work aagum": "kandippa velai vaanganom",
-        "interview poganum": "interview ku poganum",
-        "job search romba tough": "job search periya challenge",
-        "work pressure semma high": "work pressure romba high",
-        "company la set aagiduven": "company la adjust aagiduven",
-        
-        # Motivation and encouragement phrases
-        "nambikkai irrukanum": "nambikkai irukanom",
-        "pathu seeiya": "parthu pannu",
-        "thirupi try pannu": "thirumba try pannu",
-        "oru naal win pannuvey": "oru naal jeipa",
-        "oru naal periya aagiduven": "oru naal periya aal aagiduvom",
-        "kastam vanthaa thaan growth": "kashtam vantha than growth",
-        "mokka pesatha bro": "mokka podadha bro",
-        "stress eduthukkama work pannu": "stress eduthukkama work pannunga",
-        
-        # Conversational & Casual corrections
-        "bro evlo stress aayiduchu": "bro romba stress aaiduchu",
-        "sama kashtama iruku da": "romba kashtama iruku daa",
-        "parava illa bro": "parava illa daa",
-        "ennada nadakudhu": "enna daa nadakudhu",
-        "evlo time aagiduchu": "evlo neram aagiduchu",
-        "nallavanga kita pesunga": "nallavanga kita pesunga bro",
-        "edhuku ivlo tension edukkura": "ethuku ivlo tension aagura",
-        "evlo try pannalum set aagala": "evlo try pannalum set aagala bro",
-        "aprum enna panrathu": "aprm enna bro panna pora",
-        "semma matter da": "mukkiyamana vishyam da",
-        "na solliten la": "naan solliten la",
-        "apdi nu think pannadha": "epdi nu think pannadha bro",
-        "panra work la full focus pannu": "panra work la full focus pannunga",
-        "seri seri poi thoongu": "seri seri, poi thoongu",
-        "thirumba start pannalama": "thirumba start pannalama bro",
-        "ennamo correct ah theriyala": "ennamo correct ah therila bro",
-        "kandippa next level povom": "kandippa next level povom bro",
-        "romba naala free time illa": "romba naala free time illa bro",
-        "current situation ku adjust pannu": "current situation ku adjust pannunga",
-        "padikka try pannu": "padikka try pannunga",
-        "intha time la stress eduthukkama iru": "intha time la stress eduthukama iru bro",
-        "situation la nallaa handle pannu": "intha situation la nallaa handle pannunga",
-        "pudhu plan start pannu": "pudhu plan start pannunga",
-        "sama jolly ah iruku bro": "romba jolly ah iruku bro",
-        "day by day improve aagunga": "daily improve aagunga",
-        "chumma doubt tha bro": "chumma doubt dhan bro",
-        "simple ah think pannu": "simple ah yosichu paaru",
-        "thirumba yosika vendam": "thirumba yosikadha bro",
-        "full tension da": "full tension daa",
-        "nallaa irundha pothum bro": "nalla irundha pothum bro",
-        "relax ah iru bro": "relax ah iru bro",
-        "porumaiya iru bro": "porumaiya iru bro",
-        "work speed aagiduchu": "work speed aagiduchu bro",
-        "ellam set aagidum da": "ellam set aagidum daa",
-        
-        # Positive Affirmations & Productivity
-        "nalla chance kedaikum": "nallaa chance kedaikum",
-        "self-improvement mukkiyam": "self-improvement romba mukkiyam",
-        "daily learn pannu": "daily learn pannu",
-        
-        # Networking & Communication
-        "connect aagunga": "connect pannunga",
-        "reply varuma": "reply varuma?",
-        "DM pannu": "DM pannunga",
-        "network build pannu": "network build pannunga",
-        "speech improve pannu": "speech develop pannunga"
-    }
-    
-    for wrong, correct in corrections.items():
-        text = text.replace(wrong, correct)
-
-    return text
+    return TANGLISH_CORRECTOR.correct(text)
 
 
 if __name__ == "__main__":
-    process_posts("data/raw.json", "data/processed_posts.json")
+    parser = argparse.ArgumentParser(description="Enrich raw LinkedIn posts with LLM metadata.")
+    parser.add_argument("--raw", default="data/raw.json", help="Raw posts (JSON array or JSONL)")
+    parser.add_argument("--output", default=None, help="Processed output file")
+    parser.add_argument("--workers", type=int, default=1, help="Concurrent metadata extractions")
+    parser.add_argument("--cache", default="data/metadata_cache.sqlite", help="SQLite metadata cache ('' disables it)")
+    parser.add_argument("--batch-tokens", type=int, default=None, help="Pack posts into batched requests of this many tokens")
+    parser.add_argument("--incremental", action="store_true", help="Only enrich new or changed posts")
+    parser.add_argument("--stream", action="store_true", help="Stream posts to a JSONL output (resumable)")
+    parser.add_argument("--tag-registry", default=TAG_REGISTRY_FILE, help="Persistent canonical tag registry ('' keeps it in memory)")
+    parser.add_argument("--columnar", default=None, help="Also write a memory-mappable columnar copy (e.g. data/processed_posts.apcol)")
+    parser.add_argument("--no-vectors", action="store_true", help="Skip building the semantic vector index")
+    parser.add_argument("--dedup-threshold", type=float, default=None, help=f"Similarity above which posts share one metadata extraction (default {DEDUP_THRESHOLD})")
+    parser.add_argument("--no-dedup", action="store_true", help="Enrich every post, including near-duplicates")
+    parser.add_argument("--dead-letters", default=DEAD_LETTER_FILE, help="Write posts that fail enrichment here and keep going ('' aborts on the first failure)")
+    parser.add_argument("--replay-dead-letters", action="store_true", help="Re-process only the posts in the dead-letter file and add them to the output")
+    parser.add_argument("--metrics", default=None, help="Write timing/token metrics here (.prom for Prometheus text, else JSON)")
+    args = parser.parse_args()
+
+    # Streaming and replay runs enrich every post they read; reject options they would silently ignore
+    if args.replay_dead_letters or args.stream:
+        mode = "--replay-dead-letters" if args.replay_dead_letters else "--stream"
+        options = {"--stream": args.stream, "--incremental": args.incremental,
+                   "--dedup-threshold": args.dedup_threshold is not None, "--no-dedup": args.no_dedup}
+        ignored = [option for option, given in options.items() if given and option != mode]
+        if ignored:
+            parser.error(f"{mode} cannot be combined with {', '.join(ignored)}")
+    dedup_threshold = DEDUP_THRESHOLD if args.dedup_threshold is None else args.dedup_threshold
+    if args.no_dedup:
+        dedup_threshold = None
+
+    output = args.output or ("data/processed_posts.jsonl" if args.stream else "data/processed_posts.json")
+    index_path = None if args.no_vectors else vector_index_path(output)
+    if args.replay_dead_letters:
+        replay_dead_letters(args.dead_letters or DEAD_LETTER_FILE, output, max_workers=args.workers,
+                            cache_path=args.cache, batch_token_budget=args.batch_tokens,
+                            tag_registry_path=args.tag_registry, columnar_path=args.columnar, index_path=index_path)
+    elif args.stream:
+        process_posts_stream(args.raw, output,
+                             max_workers=args.workers, cache_path=args.cache, batch_token_budget=args.batch_tokens,
+                             tag_registry_path=args.tag_registry, columnar_path=args.columnar, index_path=index_path,
+                             dead_letter_path=args.dead_letters)
+    else:
+        process_posts(args.raw, output, max_workers=args.workers,
+                      cache_path=args.cache, incremental=args.incremental, batch_token_budget=args.batch_tokens,
+                      tag_registry_path=args.tag_registry, columnar_path=args.columnar, index_path=index_path,
+                      dedup_threshold=dedup_threshold, dead_letter_path=args.dead_letters)
+
+    if args.metrics:
+        REGISTRY.write(args.metrics)
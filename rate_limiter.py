@@ -0,0 +1,187 @@
+import os
+import random
+import threading
+import time
+
+
+class MaxRetriesError(Exception):
+    """Raised when an LLM call still fails after every retry."""
+
+    def __init__(self, attempts, last_error):
+        super().__init__(f"Max retries reached ({attempts} attempts): {last_error}")
+        self.attempts = attempts
+        self.last_error = last_error
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate_per_minute`, holding at most one minute of quota."""
+
+    def __init__(self, rate_per_minute, clock=time.monotonic):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(rate_per_minute)
+        self.available = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def reserve(self, amount):
+        """Takes `amount` from the bucket and returns how many seconds the caller must wait first.
+
+        The balance may go negative, so later callers queue behind earlier reservations.
+        Must be called with the owning limiter's lock held.
+        """
+
+        now = self.clock()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+        amount = min(amount, self.capacity)  # A single oversized request must still go through
+        self.available -= amount
+        if self.available >= 0:
+            return 0.0
+        return -self.available / self.rate
+
+    def settle(self, reserved, used):
+        """Refunds (or charges) the difference once a reservation's actual usage is known.
+
+        Must be called with the owning limiter's lock held.
+        """
+
+        delta = min(reserved, self.capacity) - min(used, self.capacity)
+        self.available = min(self.capacity, self.available + delta)
+
+
+class RateLimiter:
+    """Shared client-side limiter for requests per minute and tokens per minute.
+
+    `reserve()` is thread-safe and never blocks; `acquire()` sleeps the calling thread for
+    the delay it returns. A Retry-After from the provider pauses every caller via `pause()`.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, clock=time.monotonic):
+        self.clock = clock
+        self.requests = TokenBucket(requests_per_minute, clock) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute, clock) if tokens_per_minute else None
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens=0):
+        """Reserves one request and `tokens` tokens; returns the delay before the call may start."""
+
+        with self._lock:
+            delay = max(0.0, self.paused_until - self.clock())
+            if self.requests:
+                delay = max(delay, self.requests.reserve(1))
+            if self.tokens and tokens:
+                delay = max(delay, self.tokens.reserve(tokens))
+            return delay
+
+    def settle(self, reserved, used):
+        """Corrects a `reserved` token estimate with the tokens a call actually `used`."""
+
+        if self.tokens and reserved:
+            with self._lock:
+                self.tokens.settle(reserved, used)
+
+    def acquire(self, tokens=0):
+        """Blocks the calling thread until the request fits the quota."""
+
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    def pause(self, seconds):
+        """Holds back every caller for `seconds` (used when the provider sends Retry-After)."""
+
+        with self._lock:
+            self.paused_until = max(self.paused_until, self.clock() + seconds)
+
+
+def get_retry_after(error):
+    """Returns the Retry-After delay in seconds carried by an API error, or None."""
+
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is None:
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        retry_after = headers.get("retry-after")
+    try:
+        return float(retry_after) if retry_after is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with jitter for errors that carry no Retry-After."""
+
+    return 2 ** attempt + random.uniform(0, 1)
+
+
+def call_with_retries(func, limiter=None, tokens=0, max_retries=3):
+    """Calls `func()` within the limiter's quota, retrying failures.
+
+    Every attempt reserves `tokens`; a failed attempt's reservation is refunded, so the caller
+    only settles the successful one with its actual usage. Provider Retry-After delays pause the shared limiter, so every other caller waits too;
+    other errors back off exponentially. Raises MaxRetriesError once retries run out.
+    """
+
+    last_error = None
+    for attempt in range(max_retries):
+        if limiter:
+            limiter.acquire(tokens)
+        try:
+            return func()
+        except Exception as e:
+            last_error = e
+            if limiter:
+                limiter.settle(tokens, 0)  # Only the successful attempt's reservation is settled by the caller
+            print(f"Attempt {attempt+1} failed: {e}")
+            if attempt + 1 < max_retries:
+                delay = _retry_delay(e, attempt, limiter)
+                if delay:
+                    time.sleep(delay)
+
+    raise MaxRetriesError(max_retries, last_error)
+
+
+def _retry_delay(error, attempt, limiter):
+    retry_after = get_retry_after(error)
+    if retry_after is None:
+        return backoff_delay(attempt)
+    if limiter:
+        limiter.pause(retry_after)  # The next acquire() waits it out for every caller
+        return 0.0
+    return retry_after
+
+
+_UNSET = object()
+_default_limiter = _UNSET  # Set by set_default_limiter; overrides the per-key limiters
+_limiters = {}  # API key -> RateLimiter, created on first use
+_default_limiter_lock = threading.Lock()
+
+
+def get_default_limiter(api_key=None):
+    """Returns the limiter shared by all LLM calls made with `api_key`.
+
+    Quotas are per API key at the provider, so each key gets its own limiter and a Retry-After
+    on one key does not hold back callers using another. Quotas come from
+    GROQ_REQUESTS_PER_MINUTE and GROQ_TOKENS_PER_MINUTE (0 disables a limit).
+    """
+
+    with _default_limiter_lock:
+        if _default_limiter is not _UNSET:
+            return _default_limiter
+        limiter = _limiters.get(api_key)
+        if limiter is None:
+            limiter = _limiters[api_key] = RateLimiter(
+                requests_per_minute=float(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30")),
+                tokens_per_minute=float(os.getenv("GROQ_TOKENS_PER_MINUTE", "6000")),
+            )
+        return limiter
+
+
+def set_default_limiter(limiter):
+    """Uses one limiter for every API key (e.g. with different quotas, or None to disable limiting)."""
+
+    global _default_limiter
+    with _default_limiter_lock:
+        _default_limiter = limiter
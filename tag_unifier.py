@@ -0,0 +1,189 @@
+import json
+import math
+import os
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+# Canonical tags and the aliases mapped onto them, kept across preprocessing runs
+TAG_REGISTRY_FILE = "data/tag_registry.json"
+
+
+def normalize_tag(tag):
+    """Normalises a tag for vocabulary lookups (case, separators and spacing)."""
+
+    return " ".join(tag.replace("-", " ").replace("_", " ").casefold().split())
+
+
+def tag_ngrams(tag, n=3):
+    """Returns the character n-grams of a normalised, space-padded tag."""
+
+    text = f" {normalize_tag(tag)} "
+    return {text[i:i + n] for i in range(max(1, len(text) - n + 1))}
+
+
+def title_case(tag):
+    """Title-cases a tag while keeping acronyms such as "AI" or "SQL" intact."""
+
+    return " ".join(word if word.isupper() else word.capitalize() for word in tag.split())
+
+
+def similarity(a, b):
+    """Jaccard similarity of two n-gram sets."""
+
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared) if shared else 0.0
+
+
+def cluster_tags(tags, threshold=0.5, leaders=()):
+    """Groups tags by character trigram Jaccard similarity and returns clusters led by their first tag.
+
+    Tags are visited shortest first; each joins its most similar leader if the similarity
+    reaches `threshold`, otherwise it leads a new cluster. Every member is therefore close to
+    its leader, so clusters cannot chain into one giant group. `leaders` seeds clusters that
+    other tags can join (e.g. known canonical tags).
+
+    Candidate leaders come from an inverted index over each leader's rarest n-grams (prefix
+    filtering): two sets with Jaccard >= threshold must share one of them, so no match is
+    missed while common n-grams never blow up the candidate lists.
+    """
+
+    leaders = sorted(set(leaders))
+    tags = sorted(set(tags) - set(leaders), key=lambda tag: (len(tag), tag))
+    grams = {tag: tag_ngrams(tag) for tag in leaders + tags}
+    frequency = Counter(gram for tag_grams in grams.values() for gram in tag_grams)
+
+    def prefix(tag_grams):
+        rarest = sorted(tag_grams, key=lambda gram: (frequency[gram], gram))
+        return rarest[:len(tag_grams) - math.ceil(threshold * len(tag_grams)) + 1]
+
+    clusters = []
+    index = defaultdict(list)
+
+    def add_leader(tag):
+        for gram in prefix(grams[tag]):
+            index[gram].append(len(clusters))
+        clusters.append([tag])
+
+    for leader in leaders:
+        add_leader(leader)
+
+    for tag in tags:
+        tag_grams = grams[tag]
+        candidates = set()
+        for gram in prefix(tag_grams):
+            candidates.update(index.get(gram, ()))
+
+        best, best_similarity = None, 0.0
+        for candidate in sorted(candidates):
+            leader_grams = grams[clusters[candidate][0]]
+            if len(leader_grams) < threshold * len(tag_grams) or len(tag_grams) < threshold * len(leader_grams):
+                continue  # Sizes too different to reach the threshold
+            score = similarity(tag_grams, leader_grams)
+            if score >= threshold and score > best_similarity:
+                best, best_similarity = candidate, score
+
+        if best is None:
+            add_leader(tag)
+        else:
+            clusters[best].append(tag)
+
+    return clusters
+
+
+class TagRegistry:
+    """Persistent map from normalised tags to their canonical tag.
+
+    Canonical tags map onto themselves, so a later run resolves both known aliases and
+    canonical names without the LLM. With no path the registry only lives in memory.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.aliases = {}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                self.aliases = json.load(file).get("aliases", {})
+
+    def lookup(self, tag):
+        """Returns the canonical tag for `tag`, or None if it has not been seen."""
+
+        return self.aliases.get(normalize_tag(tag))
+
+    def register(self, tag, canonical):
+        """Records `tag` as an alias of `canonical` (which becomes canonical if it was unknown)."""
+
+        canonical = self.aliases.setdefault(normalize_tag(canonical), canonical)
+        self.aliases[normalize_tag(tag)] = canonical
+        return canonical
+
+    def canonical_tags(self):
+        return set(self.aliases.values())
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, mode="w", encoding="utf-8") as file:
+            json.dump({"aliases": dict(sorted(self.aliases.items()))}, file, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+def unify(tags, registry, name_clusters, chunk_size=40, max_workers=4, threshold=0.5):
+    """Maps every tag onto a canonical tag and returns the {tag: canonical} mapping.
+
+    Tags already in the registry are resolved directly. The rest are clustered around the
+    registry's canonical tags: tags close to a canonical tag join it, and only clusters of
+    entirely new tags are named by `name_clusters`, which takes a list of clusters and
+    returns one name (or None) per cluster. Naming runs in chunks of `chunk_size` clusters
+    on `max_workers` threads. The registry is updated in place.
+    """
+
+    mapping = {}
+    unknown = []
+    for tag in set(tags):
+        canonical = registry.lookup(tag)
+        if canonical is None:
+            unknown.append(tag)
+        else:
+            mapping[tag] = canonical
+
+    if not unknown:
+        return mapping
+
+    canonicals = registry.canonical_tags()
+    unnamed = []
+    for cluster in cluster_tags(unknown, threshold, leaders=canonicals):
+        leader, members = cluster[0], cluster[1:]
+        if leader in canonicals:
+            for tag in members:
+                mapping[tag] = leader
+        else:
+            unnamed.append(cluster)
+
+    chunks = [unnamed[i:i + chunk_size] for i in range(0, len(unnamed), chunk_size)]
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        names = [name for chunk_names in executor.map(_safe_namer(name_clusters), chunks) for name in chunk_names]
+
+    for cluster, name in zip(unnamed, names):
+        name = name or title_case(cluster[0])  # The leader is the cluster's shortest tag
+        canonical = registry.register(name, name)  # Resolves to an existing canonical of the same name
+        for tag in cluster:
+            mapping[tag] = canonical
+
+    for tag, canonical in mapping.items():
+        registry.register(tag, canonical)
+    return mapping
+
+
+def _safe_namer(name_clusters):
+    """Wraps a cluster namer so a failed chunk falls back to local names instead of aborting the run."""
+
+    def name_chunk(chunk):
+        try:
+            names = list(name_clusters(chunk))
+        except Exception as e:
+            print(f"⚠️ Warning: naming {len(chunk)} tag clusters failed ({e}). Using local names.")
+            return [None] * len(chunk)
+        return (names + [None] * len(chunk))[:len(chunk)]
+
+    return name_chunk
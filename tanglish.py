@@ -0,0 +1,102 @@
+import json
+import os
+import re
+
+CORRECTIONS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "tanglish_corrections.json")
+
+
+def load_corrections(file_path=CORRECTIONS_FILE):
+    """Loads the Tanglish phrase -> corrected phrase dictionary from a JSON file."""
+
+    with open(file_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class TanglishCorrector:
+    """Applies a phrase correction dictionary in a single pass over the text.
+
+    The phrases are compiled into one trie-shaped regex, so matching cost depends on the
+    text length and phrase length, not on the number of entries. At every position the
+    longest matching phrase wins, and replaced text is never rescanned.
+    """
+
+    def __init__(self, corrections):
+        self.corrections = {wrong: correct for wrong, correct in corrections.items() if wrong}
+        self.max_phrase_length = max(map(len, self.corrections), default=0)
+        self.pattern = re.compile(_build_trie_pattern(self.corrections)) if self.corrections else None
+
+    @classmethod
+    def from_file(cls, file_path=CORRECTIONS_FILE):
+        return cls(load_corrections(file_path))
+
+    def correct(self, text):
+        """Returns the text with every dictionary phrase replaced by its correction."""
+
+        if self.pattern is None:
+            return text
+        return self.pattern.sub(self._replace, text)
+
+    def correct_stream(self, chunks):
+        """Corrects an iterable of text chunks incrementally, yielding corrected text as it becomes final.
+
+        Only the last `max_phrase_length - 1` characters are held back, since a phrase starting
+        there could still be completed by the next chunk. The joined output equals
+        `correct("".join(chunks))`.
+        """
+
+        if self.pattern is None:
+            yield from chunks
+            return
+
+        hold = self.max_phrase_length - 1
+        pending = ""
+        for chunk in chunks:
+            pending += chunk
+            safe = len(pending) - hold  # Matches starting before here fit entirely in `pending`
+            if safe <= 0:
+                continue
+
+            out = []
+            pos = 0
+            for match in self.pattern.finditer(pending):
+                if match.start() >= safe:
+                    break
+                out.append(pending[pos:match.start()])
+                out.append(self.corrections[match.group(0)])
+                pos = match.end()
+            cut = max(pos, safe)
+            out.append(pending[pos:cut])
+            pending = pending[cut:]
+
+            text = "".join(out)
+            if text:
+                yield text
+
+        if pending:
+            yield self.correct(pending)
+
+    def _replace(self, match):
+        return self.corrections[match.group(0)]
+
+
+def _build_trie_pattern(phrases):
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = True  # End-of-phrase marker
+    return _trie_node_pattern(trie)
+
+
+def _trie_node_pattern(node):
+    is_end = "" in node
+    branches = [re.escape(char) + _trie_node_pattern(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ""
+
+    if len(branches) == 1 and not is_end:
+        return branches[0]
+    pattern = "(?:" + "|".join(branches) + ")"
+    # A greedy optional tail prefers the longer phrase and falls back to the shorter one
+    return pattern + "?" if is_end else pattern
@@ -0,0 +1,176 @@
+import argparse
+import hashlib
+import os
+import numpy as np
+from embeddings import get_embedder
+from post_store import LENGTHS, categorize_length, fingerprint_row
+
+# Corpora at least this large get an IVF (inverted file) index; smaller ones are searched brute force
+IVF_MIN_POSTS = 20000
+
+
+def vector_index_path(processed_file_path):
+    """Default index location next to a processed posts file (shared by its .json/.jsonl/.apcol copies)."""
+
+    return os.path.splitext(processed_file_path)[0] + ".vectors"
+
+
+def post_embedding_text(post):
+    """Text embedded for a processed post: its body plus its tags."""
+
+    return f"{post['text']}\n{' '.join(post.get('tags', []))}"
+
+
+class VectorIndex:
+    """Cosine-similarity index over post embeddings, with language and length filters.
+
+    Stored as `<path>.npy` (the vectors, memory-mapped on load) and `<path>.npz` (embedder
+    name, fingerprint of the indexed posts, per-row filter codes and, for large corpora, the
+    IVF lists). Row numbers follow the processed posts file, so results map straight back to
+    its records.
+    """
+
+    def __init__(self, vectors, languages, language_codes, length_codes, embedder_name, fingerprint=None,
+                 centroids=None, list_rows=None, list_offsets=None):
+        self.vectors = vectors
+        self.fingerprint = fingerprint
+        self.languages = languages
+        self.language_codes = language_codes
+        self.length_codes = length_codes
+        self.embedder_name = embedder_name
+        # IVF: rows of list i are list_rows[list_offsets[i]:list_offsets[i + 1]]
+        self.centroids = centroids
+        self.list_rows = list_rows
+        self.list_offsets = list_offsets
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @classmethod
+    def build(cls, posts, embedder=None, batch_size=1024):
+        """Embeds an iterable of processed posts, batch by batch."""
+
+        embedder = embedder or get_embedder()
+        languages = {}
+        chunks, language_codes, length_codes = [], [], []
+        batch = []
+        digest = hashlib.sha256()  # post_store.posts_fingerprint, computed in the single pass over `posts`
+        for post in posts:
+            batch.append(post_embedding_text(post))
+            digest.update(fingerprint_row(post))
+            language_codes.append(languages.setdefault(post["language"], len(languages)))
+            length_codes.append(LENGTHS.index(categorize_length(post["line_count"])))
+            if len(batch) >= batch_size:
+                chunks.append(embedder.embed(batch))
+                batch = []
+        if batch:
+            chunks.append(embedder.embed(batch))
+
+        vectors = np.concatenate(chunks) if chunks else np.zeros((0, getattr(embedder, "dim", 1)), dtype=np.float32)
+        index = cls(vectors, list(languages), np.array(language_codes, dtype=np.uint8),
+                    np.array(length_codes, dtype=np.uint8), embedder.name, digest.hexdigest())
+        if len(vectors) >= IVF_MIN_POSTS:
+            index.train_ivf()
+        return index
+
+    def train_ivf(self, iterations=10, seed=0):
+        """Clusters the vectors with spherical k-means (about sqrt(n) lists) so searches probe a few lists only."""
+
+        rng = np.random.default_rng(seed)
+        n_lists = int(np.sqrt(len(self.vectors)))
+        sample = self.vectors[rng.choice(len(self.vectors), min(len(self.vectors), n_lists * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for i in range(n_lists):
+                members = sample[assignment == i]
+                if len(members):
+                    centroids[i] = members.sum(axis=0)
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+
+        assignment = np.concatenate([
+            np.argmax(self.vectors[start:start + 65536] @ centroids.T, axis=1)
+            for start in range(0, len(self.vectors), 65536)
+        ])
+        self.list_rows = np.argsort(assignment, kind="stable")
+        self.list_offsets = np.searchsorted(assignment[self.list_rows], np.arange(n_lists + 1))
+        self.centroids = centroids
+
+    def search(self, query, k=5, language=None, length=None, n_probe=8):
+        """Returns [(row, score)] of the k posts most similar to the query text, best first."""
+
+        if not len(self.vectors):
+            return []
+        vector = get_embedder(self.embedder_name).embed([query])[0]
+
+        if self.centroids is not None:
+            probes = np.argsort(-(self.centroids @ vector))[:n_probe]
+            rows = np.concatenate([self.list_rows[self.list_offsets[i]:self.list_offsets[i + 1]] for i in probes])
+        else:
+            rows = np.arange(len(self.vectors))
+
+        mask = np.ones(len(rows), dtype=bool)
+        if language is not None:
+            if language not in self.languages:
+                return []
+            mask &= self.language_codes[rows] == self.languages.index(language)
+        if length is not None:
+            mask &= self.length_codes[rows] == LENGTHS.index(length)
+        rows = rows[mask]
+        if not len(rows):
+            return []
+
+        scores = self.vectors[rows] @ vector
+        top = np.argpartition(-scores, min(k, len(rows)) - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(rows[i]), float(scores[i])) for i in top]
+
+    def save(self, path):
+        np.save(path + ".npy", self.vectors)
+        meta = {
+            "embedder": np.array(self.embedder_name),
+            "fingerprint": np.array(self.fingerprint or ""),
+            "languages": np.array(self.languages, dtype=str),
+            "language_codes": self.language_codes,
+            "length_codes": self.length_codes,
+        }
+        if self.centroids is not None:
+            meta.update(centroids=self.centroids, list_rows=self.list_rows, list_offsets=self.list_offsets)
+        tmp_path = path + ".npz.tmp"
+        with open(tmp_path, "wb") as file:
+            np.savez(file, **meta)
+        os.replace(tmp_path, path + ".npz")
+
+    @classmethod
+    def load(cls, path):
+        """Loads an index saved with save(); the vectors are memory-mapped rather than read."""
+
+        with np.load(path + ".npz") as meta:
+            ivf = [meta[name] for name in ("centroids", "list_rows", "list_offsets")] if "centroids" in meta else []
+            fingerprint = str(meta["fingerprint"]) if "fingerprint" in meta else None
+            return cls(np.load(path + ".npy", mmap_mode="r"), meta["languages"].tolist(), meta["language_codes"],
+                       meta["length_codes"], str(meta["embedder"]), fingerprint or None, *ivf)
+
+    @classmethod
+    def exists(cls, path):
+        return os.path.exists(path + ".npy") and os.path.exists(path + ".npz")
+
+
+if __name__ == "__main__":
+    from post_io import iter_posts
+    from post_store import ColumnarPosts
+
+    parser = argparse.ArgumentParser(description="Build the vector index of a processed posts file (no LLM calls).")
+    parser.add_argument("input", nargs="?", default="data/processed_posts.json", help="Processed posts file (.json, .jsonl or .apcol)")
+    parser.add_argument("output", nargs="?", help="Index path without extension (default: next to the input)")
+    args = parser.parse_args()
+
+    if args.input.endswith(".apcol"):
+        store = ColumnarPosts(args.input)
+        posts = (store.record(row) for row in range(len(store)))
+    else:
+        posts = iter_posts(args.input)
+    output = args.output or vector_index_path(args.input)
+    index = VectorIndex.build(posts)
+    index.save(output)
+    print(f"Indexed {len(index)} posts to {output}.npy/.npz")